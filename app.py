@@ -1,21 +1,62 @@
 import os
+import orjson
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from sqlalchemy import func, case
 from werkzeug.utils import secure_filename
 from config import config
-from database.models import db, Product, ScanHistory
+from database.models import db, Product, ScanHistory, create_missing_indexes
 from scanners.barcode_reader import BarcodeReader
 from services.product_service import ProductService
+from services.cdsco_service import CDSCOService
+from services.cache import cache
+from services.log_queue import configure_logging
 from database.seed_data import seed_database
 
 
+# Static Jan Aushadhi scheme details returned with medicine alternatives
+_JAN_AUSHADHI_INFO = {
+    'scheme_name': 'Pradhan Mantri Bhartiya Janaushadhi Pariyojana (PMBJP)',
+    'website': 'https://janaushadhi.gov.in',
+    'total_stores': '10,000+ across India',
+    'description': 'Government scheme providing quality generic medicines at affordable prices',
+}
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson (much faster on large product payloads)"""
+
+    OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        option = self.OPTIONS | (orjson.OPT_INDENT_2 if kwargs.get('indent') else 0)
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.OPTIONS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option),
+            mimetype=self.mimetype,
+        )
+
+
 def create_app(config_name='default'):
     """Application factory"""
+    configure_logging()
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     app.config.from_object(config[config_name])
 
     # Initialize extensions
     db.init_app(app)
+    cache.init_app(app)
     CORS(app)
 
     # Ensure upload folder exists
@@ -24,24 +65,45 @@ def create_app(config_name='default'):
     # Initialize services
     barcode_reader = BarcodeReader()
     product_service = ProductService()
+    cdsco_service = CDSCOService()
+
+    allowed_extensions = frozenset(app.config['ALLOWED_EXTENSIONS'])
 
     def allowed_file(filename):
-        return '.' in filename and \
-            filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+        return os.path.splitext(filename)[1][1:].lower() in allowed_extensions
+
+    @cache.cached(timeout=60, key_prefix='product_stats')
+    def get_product_stats():
+        """Product counts per category, Indian products and total scans"""
+        rows = db.session.query(
+            Product.category,
+            func.count(Product.id),
+            func.sum(case((Product.country_of_origin == 'India', 1), else_=0)),
+        ).group_by(Product.category).all()
+
+        categories = {category: count for category, count, _ in rows}
+        return {
+            'total_products': sum(categories.values()),
+            'total_scans': db.session.query(func.count(ScanHistory.id)).scalar(),
+            'categories': categories,
+            'indian_products': sum(indian or 0 for _, _, indian in rows),
+        }
 
     # ==================== WEB ROUTES ====================
 
     @app.route('/')
     def index():
         """Home page"""
+        product_stats = get_product_stats()
+        categories = product_stats['categories']
         stats = {
-            'total_products': Product.query.count(),
-            'total_scans': ScanHistory.query.count(),
-            'food_products': Product.query.filter_by(category='food').count(),
-            'medicines': Product.query.filter_by(category='medicine').count(),
-            'skincare': Product.query.filter_by(category='skincare').count(),
-            'haircare': Product.query.filter_by(category='haircare').count(),
-            'nutraceuticals': Product.query.filter_by(category='nutraceutical').count(),
+            'total_products': product_stats['total_products'],
+            'total_scans': product_stats['total_scans'],
+            'food_products': categories.get('food', 0),
+            'medicines': categories.get('medicine', 0),
+            'skincare': categories.get('skincare', 0),
+            'haircare': categories.get('haircare', 0),
+            'nutraceuticals': categories.get('nutraceutical', 0),
         }
         return render_template('index.html', stats=stats)
 
@@ -173,6 +235,7 @@ def create_app(config_name='default'):
         return jsonify(result)
 
     @app.route('/api/search')
+    @cache.cached(timeout=300, query_string=True)
     def api_search():
         """API: Search products"""
         query = request.args.get('q', '')
@@ -197,18 +260,11 @@ def create_app(config_name='default'):
         brand = data.get('brand', '')
         composition = data.get('composition', '')
 
-        from services.cdsco_service import CDSCOService
-        cdsco = CDSCOService()
-        alternatives = cdsco.find_generic_alternatives(brand, composition)
+        alternatives = cdsco_service.find_generic_alternatives(brand, composition)
 
         return jsonify({
             'alternatives': alternatives,
-            'jan_aushadhi_info': {
-                'scheme_name': 'Pradhan Mantri Bhartiya Janaushadhi Pariyojana (PMBJP)',
-                'website': 'https://janaushadhi.gov.in',
-                'total_stores': '10,000+ across India',
-                'description': 'Government scheme providing quality generic medicines at affordable prices',
-            }
+            'jan_aushadhi_info': _JAN_AUSHADHI_INFO,
         })
 
     @app.route('/api/history')
@@ -221,19 +277,19 @@ def create_app(config_name='default'):
     @app.route('/api/stats')
     def api_stats():
         """API: Get application statistics"""
+        product_stats = get_product_stats()
+        categories = product_stats['categories']
         stats = {
-            'total_products': Product.query.count(),
-            'total_scans': ScanHistory.query.count(),
+            'total_products': product_stats['total_products'],
+            'total_scans': product_stats['total_scans'],
             'categories': {
-                'food': Product.query.filter_by(category='food').count(),
-                'medicine': Product.query.filter_by(category='medicine').count(),
-                'nutraceutical': Product.query.filter_by(category='nutraceutical').count(),
-                'skincare': Product.query.filter_by(category='skincare').count(),
-                'haircare': Product.query.filter_by(category='haircare').count(),
+                'food': categories.get('food', 0),
+                'medicine': categories.get('medicine', 0),
+                'nutraceutical': categories.get('nutraceutical', 0),
+                'skincare': categories.get('skincare', 0),
+                'haircare': categories.get('haircare', 0),
             },
-            'indian_products': Product.query.filter(
-                Product.country_of_origin == 'India'
-            ).count(),
+            'indian_products': product_stats['indian_products'],
         }
         return jsonify(stats)
 
@@ -253,12 +309,24 @@ def create_app(config_name='default'):
 
     # ==================== DATABASE INITIALIZATION ====================
 
-    with app.app_context():
+    def init_database():
+        """Create tables and indexes, and seed an empty database"""
         db.create_all()
-        if Product.query.count() == 0:
+        create_missing_indexes()
+        if db.session.query(Product.id).first() is None:
             seed_database()
             print("Database initialized with Indian product data")
 
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create the database and seed it with Indian product data"""
+        init_database()
+
+    # Production runs `flask init-db` once at deploy instead of in every worker
+    if app.config['AUTO_INIT_DB']:
+        with app.app_context():
+            init_database()
+
     return app
 
 
@@ -2,4 +2,5 @@
 set -e
 
 pip install --upgrade pip
-pip install -r requirements.txt
\ No newline at end of file
+pip install -r requirements.txt
+flask --app app init-db
\ No newline at end of file
@@ -8,6 +8,24 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'indian-barcode-scanner-2024')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///indian_products.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,
+    }
+    if SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        # Wait for the writer lock instead of failing with "database is locked"
+        SQLALCHEMY_ENGINE_OPTIONS['connect_args'] = {'timeout': 30}
+    else:
+        # SQLite's pools (StaticPool for in-memory) don't take sizing arguments
+        SQLALCHEMY_ENGINE_OPTIONS['pool_size'] = 10
+        SQLALCHEMY_ENGINE_OPTIONS['max_overflow'] = 20
+
+    # Create and seed the database on app startup (otherwise run `flask init-db`)
+    AUTO_INIT_DB = os.environ.get('AUTO_INIT_DB', '0') == '1'
+
+    # Caching - set REDIS_URL to share the cache between workers (needs the redis package)
+    CACHE_TYPE = 'RedisCache' if os.environ.get('REDIS_URL') else 'SimpleCache'
+    CACHE_REDIS_URL = os.environ.get('REDIS_URL')
+    CACHE_DEFAULT_TIMEOUT = 300
 
     # API Keys
     OPEN_FOOD_FACTS_API = "https://world.openfoodfacts.org/api/v2"
@@ -25,6 +43,7 @@ class Config:
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    AUTO_INIT_DB = os.environ.get('AUTO_INIT_DB', '1') == '1'
 
 class ProductionConfig(Config):
     DEBUG = False
@@ -1,11 +1,41 @@
+import logging
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
 from datetime import datetime
 
 db = SQLAlchemy()
 
+logger = logging.getLogger(__name__)
+
+# GS1 country prefixes assigned to India
+INDIA_GS1_PREFIXES = frozenset({'890'})
+
+# Product columns searched with ILIKE '%term%'; trigram-indexed on PostgreSQL
+TRIGRAM_SEARCH_COLUMNS = ('name', 'brand', 'manufacturer')
+
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune SQLite connections so readers don't block on scan inserts"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA cache_size=-64000')  # 64MB page cache
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA mmap_size=268435456')  # 256MB
+    cursor.close()
+
 class Product(db.Model):
     """Main product model for Indian products"""
     __tablename__ = 'products'
+    __table_args__ = (
+        # Covers the per-category stats (GROUP BY category + country check)
+        db.Index('ix_products_category_country', 'category', 'country_of_origin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     barcode = db.Column(db.String(50), unique=True, nullable=False, index=True)
@@ -28,7 +58,7 @@ class Product(db.Model):
     # Manufacturer info
     manufacturer = db.Column(db.String(255))
     manufacturer_address = db.Column(db.Text)
-    country_of_origin = db.Column(db.String(100), default='India')
+    country_of_origin = db.Column(db.String(100), default='India', index=True)
     manufactured_in = db.Column(db.String(100))
 
     # Product details
@@ -92,8 +122,9 @@ class Product(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    scan_history = db.relationship('ScanHistory', backref='product', lazy=True)
-    warnings = db.relationship('ProductWarning', backref='product', lazy=True)
+    scan_history = db.relationship('ScanHistory', back_populates='product', lazy=True)
+    # to_dict() always reads warnings, so batch-load them with the products
+    warnings = db.relationship('ProductWarning', back_populates='product', lazy='selectin')
 
     def to_dict(self):
         return {
@@ -128,6 +159,29 @@ class Product(db.Model):
             'is_indian_product': self._is_indian_barcode(),
         }
 
+    def to_list_dict(self):
+        """Summary used by list endpoints (history, search)"""
+        return {
+            'id': self.id,
+            'barcode': self.barcode,
+            'name': self.name,
+            'brand': self.brand,
+            'category': self.category,
+            'subcategory': self.subcategory,
+            'manufacturer': self.manufacturer,
+            'mrp': self.mrp,
+            'image_url': self.image_url,
+            'is_indian_product': self._is_indian_barcode(),
+        }
+
+    @classmethod
+    def list_columns(cls):
+        """Columns read by to_list_dict(), for use with load_only()"""
+        return (
+            cls.id, cls.barcode, cls.name, cls.brand, cls.category,
+            cls.subcategory, cls.manufacturer, cls.mrp, cls.image_url,
+        )
+
     def _get_nutritional_info(self):
         if self.category not in ['food', 'nutraceutical']:
             return None
@@ -181,9 +235,13 @@ class Product(db.Model):
         }
 
     def _is_indian_barcode(self):
-        if self.barcode and len(self.barcode) >= 3:
-            return self.barcode[:3] in ['890']
-        return False
+        return is_indian_barcode(self.barcode)
+
+
+def is_indian_barcode(barcode):
+    if barcode and len(barcode) >= 3:
+        return barcode[:3] in INDIA_GS1_PREFIXES
+    return False
 
 
 class ProductWarning(db.Model):
@@ -199,6 +257,8 @@ class ProductWarning(db.Model):
     issued_date = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    product = db.relationship('Product', back_populates='warnings')
+
     def to_dict(self):
         return {
             'warning_type': self.warning_type,
@@ -221,7 +281,9 @@ class ScanHistory(db.Model):
     data_source = db.Column(db.String(100))
     ip_address = db.Column(db.String(45))
     user_agent = db.Column(db.String(500))
-    scanned_at = db.Column(db.DateTime, default=datetime.utcnow)
+    scanned_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    product = db.relationship('Product', back_populates='scan_history')
 
     def to_dict(self):
         return {
@@ -231,7 +293,39 @@ class ScanHistory(db.Model):
             'scan_method': self.scan_method,
             'data_source': self.data_source,
             'scanned_at': self.scanned_at.isoformat(),
-            'product': self.product.to_dict() if self.product else None,
+            'product': self.product.to_list_dict() if self.product else None,
+        }
+
+    @classmethod
+    def history_columns(cls):
+        """
+        Columns read by history_row_to_dict(): the scan plus its product's
+        list columns, labelled product_<column> (select with an outer join)
+        """
+        return (
+            cls.id, cls.barcode_scanned, cls.product_found, cls.scan_method,
+            cls.data_source, cls.scanned_at,
+        ) + tuple(column.label(f'product_{column.key}') for column in Product.list_columns())
+
+    @staticmethod
+    def history_row_to_dict(row):
+        """Same shape as to_dict(), built from a history_columns() row"""
+        product = None
+        if row.product_id is not None:
+            product = {
+                column.key: getattr(row, f'product_{column.key}')
+                for column in Product.list_columns()
+            }
+            product['is_indian_product'] = is_indian_barcode(row.product_barcode)
+
+        return {
+            'id': row.id,
+            'barcode_scanned': row.barcode_scanned,
+            'product_found': row.product_found,
+            'scan_method': row.scan_method,
+            'data_source': row.data_source,
+            'scanned_at': row.scanned_at.isoformat(),
+            'product': product,
         }
 
 
@@ -258,4 +352,32 @@ class BannedIngredient(db.Model):
             'max_allowed': self.max_allowed,
             'regulatory_body': self.regulatory_body,
             'reason': self.reason,
-        }
\ No newline at end of file
+        }
+
+def create_missing_indexes():
+    """Create indexes added after the tables already existed (create_all skips existing tables)"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+    if db.engine.dialect.name == 'postgresql':
+        create_trigram_indexes()
+
+
+def create_trigram_indexes():
+    """
+    GIN trigram indexes for the product search (PostgreSQL only).
+
+    A leading-wildcard ILIKE can't use a B-tree index; pg_trgm's GIN indexes
+    serve it directly, so the search query itself doesn't change.
+    """
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            for column in TRIGRAM_SEARCH_COLUMNS:
+                conn.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS ix_products_{column}_trgm '
+                    f'ON products USING gin ({column} gin_trgm_ops)'
+                ))
+    except Exception as e:
+        logger.warning("Could not create trigram search indexes: %s", e)
@@ -0,0 +1,29 @@
+import os
+
+# Gunicorn settings (used by the Procfile / render.yaml start command)
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Barcode decoding runs in native code that releases the GIL, so threaded
+# workers keep serving other requests while a decode is in progress.
+# Set GUNICORN_WORKER_CLASS=gevent for mostly I/O-bound deployments.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# Every worker has its own in-process cache, lookup thread pools, scan log
+# writer and DB pool, so keep the count small. sched_getaffinity honours the
+# container's CPU set, unlike cpu_count() (it's Linux-only, hence the fallback)
+if hasattr(os, 'sched_getaffinity'):
+    _cpus = len(os.sched_getaffinity(0))
+else:
+    _cpus = os.cpu_count() or 1
+workers = int(os.environ.get('WEB_CONCURRENCY', min(_cpus, 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+keepalive = 5
+timeout = 60
+
+# Concurrency comes from workers/threads; keep numpy's and OpenCV's native
+# thread pools single-threaded so each worker doesn't start a pool per core.
+# Set here so it's in place before the app imports numpy; values already in
+# the environment win.
+raw_env = [
+    f'{name}=1' for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+    if name not in os.environ
+]
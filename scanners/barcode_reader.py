@@ -1,60 +1,220 @@
-import io
+import logging
+import multiprocessing
+import os
 import re
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from operator import mul
+
 import numpy as np
 
+# Optional: numba JIT for bulk EAN-13 validation (the NumPy path is used without it)
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+logger = logging.getLogger(__name__)
+
+# Backend-neutral decode result (mirrors the pyzbar Decoded fields we use)
+DecodedBarcode = namedtuple('DecodedBarcode', ['data', 'type'])
+
+# Any barcode the app accepts: ASCII letters, digits, '.' and '-', at most as
+# long as the 50-character barcode columns. Use with fullmatch().
+BARCODE_RE = re.compile(r'[A-Za-z0-9.\-]{1,50}')
+
+# EAN-13 check digit weights for the first 12 digits
+# (bytes iterate as cached small ints, slightly faster than a tuple in map())
+_EAN13_WEIGHTS = bytes((1, 3) * 6)
+_EAN13_WEIGHTS_NP = np.frombuffer(_EAN13_WEIGHTS, dtype=np.uint8).astype(np.int16)
+# Weighted sum contributed by the ASCII '0' offset (48) on every digit
+_EAN13_ASCII_OFFSET = 48 * sum(_EAN13_WEIGHTS)
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _ean13_check_many(block):
+        """Check rows of 13 ASCII bytes; runs without the GIL across cores"""
+        out = np.empty(block.shape[0], dtype=np.bool_)
+        for i in prange(block.shape[0]):
+            row = block[i]
+            valid = True
+            total = 0
+            for j in range(13):
+                d = np.int32(row[j]) - 48
+                if d < 0 or d > 9:
+                    valid = False
+                if j < 12:
+                    total += d * (3 if j & 1 else 1)
+            out[i] = valid and (10 - total % 10) % 10 == np.int32(row[12]) - 48
+        return out
+else:
+    _ean13_check_many = None
+
+# GS1 prefix ranges (inclusive) by country of registration, sorted by start
+_GS1_PREFIX_RANGES = [
+    (0, 19, 'USA'),
+    (30, 39, 'USA'),
+    (60, 139, 'USA'),
+    (300, 379, 'France'),
+    (400, 440, 'Germany'),
+    (450, 459, 'Japan'),
+    (460, 469, 'Russia'),
+    (471, 471, 'Taiwan'),
+    (489, 489, 'Hong Kong'),
+    (490, 499, 'Japan'),
+    (500, 509, 'UK'),
+    (690, 699, 'China'),
+    (729, 729, 'Israel'),
+    (750, 750, 'Mexico'),
+    (789, 790, 'Brazil'),
+    (800, 839, 'Italy'),
+    (840, 849, 'Spain'),
+    (880, 880, 'South Korea'),
+    (885, 885, 'Thailand'),
+    (890, 890, 'India'),
+    (893, 893, 'Vietnam'),
+    (899, 899, 'Indonesia'),
+    (930, 939, 'Australia'),
+    (955, 955, 'Malaysia'),
+]
+
+# Dense table indexed by the 3-digit prefix (000-999); index 1000 is the miss slot
+_GS1_PREFIX_TABLE = ['Unknown'] * 1001
+for _start, _end, _country in _GS1_PREFIX_RANGES:
+    _GS1_PREFIX_TABLE[_start:_end + 1] = [_country] * (_end - _start + 1)
+_GS1_PREFIX_TABLE = tuple(_GS1_PREFIX_TABLE)
+_GS1_PREFIX_TABLE_NP = np.array(_GS1_PREFIX_TABLE, dtype=object)
+
 
 class BarcodeReader:
     """Handles barcode reading - simplified version without pyzbar"""
 
-    SUPPORTED_FORMATS = [
+    SUPPORTED_FORMATS = frozenset({
         'EAN13', 'EAN8', 'UPCA', 'UPCE',
         'CODE128', 'CODE39', 'CODE93',
         'QRCODE', 'DATAMATRIX', 'PDF417'
-    ]
+    })
 
-    INDIA_GS1_PREFIXES = ['890']
+    INDIA_GS1_PREFIXES = ('890',)
 
-    def __init__(self):
-        self.last_scan_result = None
-        self.pyzbar_available = False
-        self.cv2_available = False
+    # Longest image edge passed to the decoders; product barcodes stay readable
+    MAX_IMAGE_EDGE = 1600
 
-        # Try importing pyzbar
-        try:
-            from pyzbar import pyzbar
-            self.pyzbar_available = True
-        except (ImportError, FileNotFoundError):
-            print("WARNING: pyzbar not available. Camera/image scanning disabled.")
-            print("Manual barcode entry will still work.")
+    # Shared pool for the fallback preprocessing stages (cv2 and the decoders release the GIL)
+    _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='barcode-stage')
 
-        # Try importing opencv
-        try:
-            import cv2
-            self.cv2_available = True
-        except ImportError:
-            print("WARNING: opencv not available.")
+    # Decoder backends are probed once per process and shared by every reader,
+    # so constructing a BarcodeReader doesn't repeat the imports or warnings
+    zxing_available = False
+    pyzbar_available = False
+    cv2_available = False
+    opencv_barcode_available = False
+    _zxingcpp = None
+    _pyzbar = None
+    _cv2 = None
+    _turbojpeg = None
+    _backends_loaded = False
+    _backends_lock = threading.Lock()
+
+    def __init__(self):
+        self.last_scan_result = None
+        # Per-thread CLAHE objects
+        self._thread_local = threading.local()
+        self._load_backends()
+
+    @classmethod
+    def _load_backends(cls):
+        if cls._backends_loaded:
+            return
+        with cls._backends_lock:
+            if cls._backends_loaded:
+                return
+
+            # Try importing zxing-cpp (preferred: faster and releases the GIL)
+            try:
+                import zxingcpp
+                cls._zxingcpp = zxingcpp
+                cls._zxing_formats = zxingcpp.barcode_formats_from_str(','.join(cls.SUPPORTED_FORMATS))
+                cls.zxing_available = True
+            except ImportError:
+                pass
+
+            # Try importing pyzbar
+            try:
+                from pyzbar import pyzbar
+                from pyzbar.pyzbar import ZBarSymbol
+                cls._pyzbar = pyzbar
+                # Only ask libzbar for the symbologies we support
+                cls._pyzbar_symbols = [
+                    getattr(ZBarSymbol, fmt) for fmt in cls.SUPPORTED_FORMATS
+                    if hasattr(ZBarSymbol, fmt)
+                ]
+                cls.pyzbar_available = True
+            except (ImportError, FileNotFoundError):
+                pass
+
+            # Try importing opencv (its barcode module is the last-resort decoder)
+            try:
+                import cv2
+                cls._cv2 = cv2
+                cls.cv2_available = True
+                cls.opencv_barcode_available = hasattr(cv2, 'barcode')
+                cv2.setNumThreads(1)
+                cv2.ocl.setUseOpenCL(False)
+            except ImportError:
+                logger.warning("opencv not available.")
+
+            # Try loading libjpeg-turbo (optional: decodes JPEG uploads straight to gray)
+            try:
+                from turbojpeg import TurboJPEG
+                cls._turbojpeg = TurboJPEG()
+            except (ImportError, RuntimeError, OSError):
+                pass
+
+            if not (cls.zxing_available or cls.pyzbar_available or cls.opencv_barcode_available):
+                logger.warning(
+                    "No barcode decoder available (zxing-cpp, pyzbar or opencv). "
+                    "Camera/image scanning disabled; manual barcode entry will still work."
+                )
+
+            cls._backends_loaded = True
+
+    @property
+    def decoder_available(self):
+        return self.zxing_available or self.pyzbar_available or self.opencv_barcode_available
 
     def read_from_image(self, image_data):
         """Read barcode from uploaded image data"""
-        if not self.pyzbar_available:
+        if not self.decoder_available:
             return None, "Barcode scanning from images is not available. Please use manual entry."
 
         try:
-            from pyzbar import pyzbar
-            import cv2
-
-            if isinstance(image_data, bytes):
-                nparr = np.frombuffer(image_data, np.uint8)
-                image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            cv2 = self._cv2
+
+            if isinstance(image_data, (bytes, bytearray, memoryview)):
+                image = self._decode_jpeg_gray(image_data)
+                if image is None:
+                    nparr = np.frombuffer(image_data, np.uint8)
+                    # The decoders only need luminance, so skip the 3-channel buffer
+                    image = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
             elif isinstance(image_data, np.ndarray):
-                image = image_data
+                # Convert up front so the resize and every stage work on one channel
+                image = self._to_gray(image_data)
             else:
                 return None, "Unsupported image format"
 
             if image is None:
                 return None, "Could not decode image"
 
-            results = self._scan_with_preprocessing(image)
+            small = self._limit_image_size(image)
+            results = self._scan_with_preprocessing(small)
+
+            # Tiny barcodes can be lost in the downscale; one plain full-resolution pass
+            if not results and small is not image:
+                gray = self._to_gray(image)
+                results = self._get_decoder()(gray)
 
             if results:
                 best_result = results[0]
@@ -75,96 +235,210 @@ class BarcodeReader:
         except Exception as e:
             return None, f"Error reading barcode: {str(e)}"
 
+    def _decode_jpeg_gray(self, image_data):
+        """Decode a JPEG to grayscale with libjpeg-turbo; None if unavailable or not a JPEG"""
+        if self._turbojpeg is None or bytes(image_data[:2]) != b'\xff\xd8':
+            return None
+
+        from turbojpeg import TJPF_GRAY
+        try:
+            gray = self._turbojpeg.decode(bytes(image_data), pixel_format=TJPF_GRAY)
+        except OSError:
+            return None
+        return gray.reshape(gray.shape[:2])
+
+    def read_images_batch(self, images, max_workers=None):
+        """Scan many images across worker processes (bulk catalog imports).
+
+        Returns a list of (result, error) tuples in input order.
+        """
+        # spawn, not fork: a forked child would inherit the stage pool's dead threads
+        with ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_scan_worker,
+        ) as pool:
+            return list(pool.map(_scan_one, images))
+
+    def _to_gray(self, image):
+        """Single-channel view of an image, converting only when it has colour"""
+        if image.ndim == 2:
+            return image
+        if image.shape[2] == 1:
+            return image[:, :, 0]
+        return self._cv2.cvtColor(image, self._cv2.COLOR_BGR2GRAY)
+
+    def _limit_image_size(self, image):
+        """Downscale oversized images (e.g. 12MP phone photos) before decoding"""
+        cv2 = self._cv2
+
+        # Halve with pyrDown while far too large, then finish with an area resize
+        while max(image.shape[:2]) >= 2 * self.MAX_IMAGE_EDGE:
+            image = cv2.pyrDown(image)
+
+        scale = self.MAX_IMAGE_EDGE / max(image.shape[:2])
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return image
+
     def _scan_with_preprocessing(self, image):
         """Try multiple preprocessing methods to detect barcode"""
-        from pyzbar import pyzbar
-        import cv2
-
-        all_results = []
-
-        # Method 1: Direct scan
-        results = pyzbar.decode(image)
-        all_results.extend(results)
-
-        if not all_results:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            results = pyzbar.decode(gray)
-            all_results.extend(results)
-
-        if not all_results:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            results = pyzbar.decode(thresh)
-            all_results.extend(results)
-
-        if not all_results:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            enhanced = clahe.apply(gray)
-            results = pyzbar.decode(enhanced)
-            all_results.extend(results)
-
-        if not all_results:
-            height, width = image.shape[:2]
-            scaled = cv2.resize(image, (width * 2, height * 2), interpolation=cv2.INTER_CUBIC)
-            results = pyzbar.decode(scaled)
-            all_results.extend(results)
-
-        # Remove duplicates
-        seen = set()
-        unique_results = []
-        for r in all_results:
-            key = r.data.decode('utf-8')
-            if key not in seen:
-                seen.add(key)
-                unique_results.append(r)
-
-        return unique_results
+        cv2 = self._cv2
+
+        decode = self._get_decoder()
+
+        # Method 1: Grayscale scan (the decoders work on gray internally anyway)
+        gray = self._to_gray(image)
+        results = decode(gray)
+
+        # Fallback stages are independent, so run them concurrently and take the first hit
+        if not results:
+            def local_threshold():
+                # Local (integral-image) threshold copes with uneven lighting, unlike global Otsu
+                if hasattr(cv2, 'ximgproc'):
+                    thresh = cv2.ximgproc.niBlackThreshold(
+                        gray, 255, cv2.THRESH_BINARY, 41, 0.2,
+                        binarizationMethod=cv2.ximgproc.BINARIZATION_SAUVOLA,
+                    )
+                else:
+                    thresh = cv2.adaptiveThreshold(
+                        gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 41, 10
+                    )
+                return decode(thresh)
+
+            def contrast():
+                return decode(self._get_clahe().apply(gray))
+
+            def upscale():
+                # Helps with small barcodes; modest 1.5x first, 2x only if that misses
+                for factor in (1.5, 2.0):
+                    scaled = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_LINEAR)
+                    found = decode(scaled)
+                    if found:
+                        return found
+                return []
+
+            futures = [self._executor.submit(stage) for stage in (local_threshold, contrast, upscale)]
+            for future in as_completed(futures):
+                results = future.result()
+                if results:
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+        # Remove duplicates (keyed on the raw bytes; only read_from_image decodes)
+        if len(results) < 2:
+            return results
+        return list({r.data: r for r in results}.values())
+
+    def _get_decoder(self):
+        """Best available decode function"""
+        if self.zxing_available:
+            return self._decode_zxing
+        if self.pyzbar_available:
+            return self._decode_pyzbar
+        return self._decode_opencv
+
+    def _get_clahe(self):
+        """CLAHE object for the current thread (they keep internal buffers, so not shared)"""
+        clahe = getattr(self._thread_local, 'clahe', None)
+        if clahe is None:
+            clahe = self._cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+            self._thread_local.clahe = clahe
+        return clahe
+
+    def _decode_zxing(self, image):
+        """Decode with zxing-cpp, which releases the GIL while scanning"""
+        return [
+            DecodedBarcode(r.text.encode('utf-8'), r.format.name.upper())
+            for r in self._zxingcpp.read_barcodes(image, formats=self._zxing_formats)
+        ]
+
+    def _decode_pyzbar(self, image):
+        """Decode with pyzbar (libzbar)"""
+        return self._pyzbar.decode(image, symbols=self._pyzbar_symbols)
+
+    def _decode_opencv(self, image):
+        """Decode with OpenCV's built-in barcode detector (EAN/UPC family)"""
+        # Detectors are cheap to build and not safe to share between threads
+        detector = self._cv2.barcode.BarcodeDetector()
+        ok, decoded_info, decoded_type, _ = detector.detectAndDecodeWithType(image)
+        if not ok:
+            return []
+        return [
+            DecodedBarcode(data.encode('utf-8'), fmt.replace('_', ''))
+            for data, fmt in zip(decoded_info, decoded_type) if data
+        ]
 
     def read_from_camera(self, camera_index=0, timeout=30):
         """Read barcode from camera feed"""
-        if not self.pyzbar_available or not self.cv2_available:
+        if not self.decoder_available or not self.cv2_available:
             return None, "Camera scanning not available. Please use manual entry."
         return None, "Camera scanning is handled by the browser."
 
     def _is_indian_barcode(self, barcode):
         """Check if barcode belongs to Indian GS1 prefix (890)"""
-        if barcode and len(barcode) >= 3:
-            return barcode[:3] in self.INDIA_GS1_PREFIXES
-        return False
+        return bool(barcode) and barcode.startswith(self.INDIA_GS1_PREFIXES)
 
     def validate_barcode(self, barcode):
         """Validate barcode format"""
         if not barcode:
             return False, "Barcode is empty"
 
-        if len(barcode) == 13 and barcode.isdigit():
+        # One pass each; the branches below only read these locals
+        is_ascii = barcode.isascii()
+        is_digits = is_ascii and barcode.isdigit()
+        length = len(barcode)
+
+        if length == 13 and is_digits:
             if self._validate_ean13_checksum(barcode):
                 return True, "Valid EAN-13 barcode"
             return False, "Invalid EAN-13 checksum"
 
-        if len(barcode) == 8 and barcode.isdigit():
+        if length == 8 and is_digits:
             return True, "Valid EAN-8 barcode"
 
-        if len(barcode) == 12 and barcode.isdigit():
+        if length == 12 and is_digits:
             return True, "Valid UPC-A barcode"
 
-        if re.match(r'^[A-Za-z0-9\-\.]+$', barcode):
+        if BARCODE_RE.fullmatch(barcode):
             return True, "Valid barcode format"
 
         return False, "Unrecognized barcode format"
 
     def _validate_ean13_checksum(self, barcode):
         """Validate EAN-13 checksum"""
+        # Work on the ASCII bytes directly instead of int() per digit
         try:
-            digits = [int(d) for d in barcode]
-            odd_sum = sum(digits[i] for i in range(0, 12, 2))
-            even_sum = sum(digits[i] for i in range(1, 12, 2))
-            check = (10 - (odd_sum + even_sum * 3) % 10) % 10
-            return check == digits[12]
-        except (ValueError, IndexError):
+            digits = barcode.encode('ascii')
+        except (UnicodeEncodeError, AttributeError):
+            return False
+        if len(digits) != 13 or not digits.isdigit():
             return False
 
+        total = sum(map(mul, digits, _EAN13_WEIGHTS)) - _EAN13_ASCII_OFFSET
+        return (10 - total % 10) % 10 == digits[12] - 48
+
+    def _validate_ean13_batch(self, barcodes):
+        """Validate many EAN-13 checksums at once (e.g. catalog imports).
+
+        Returns a boolean array; entries that aren't 13 ASCII digits are False.
+        """
+        if not barcodes:
+            return np.zeros(0, dtype=bool)
+        if any(len(b) != 13 for b in barcodes):
+            raise ValueError("EAN-13 batch validation expects 13-character barcodes")
+
+        data = ''.join(barcodes).encode('ascii', 'replace')
+        block = np.frombuffer(data, dtype=np.uint8).reshape(-1, 13)
+        if _ean13_check_many is not None:
+            return _ean13_check_many(block)
+
+        arr = block.astype(np.int16) - 48
+        sums = arr[:, :12] @ _EAN13_WEIGHTS_NP
+        is_digits = ((arr >= 0) & (arr <= 9)).all(axis=1)
+        return is_digits & ((10 - sums % 10) % 10 == arr[:, 12])
+
     def get_barcode_info(self, barcode):
         """Get basic info from barcode number"""
         info = {
@@ -182,27 +456,43 @@ class BarcodeReader:
 
     def _get_country_from_prefix(self, prefix):
         """Get country name from GS1 prefix"""
-        country_map = {
-            '890': 'India',
-            '000': 'USA', '001': 'USA',
-            '300': 'France',
-            '400': 'Germany',
-            '450': 'Japan',
-            '460': 'Russia',
-            '471': 'Taiwan',
-            '489': 'Hong Kong',
-            '500': 'UK',
-            '690': 'China', '699': 'China',
-            '729': 'Israel',
-            '750': 'Mexico',
-            '789': 'Brazil',
-            '800': 'Italy',
-            '840': 'Spain',
-            '880': 'South Korea',
-            '885': 'Thailand',
-            '893': 'Vietnam',
-            '899': 'Indonesia',
-            '930': 'Australia',
-            '955': 'Malaysia',
+        # isdigit() alone accepts non-ASCII digits ('²', '٨'), which int()
+        # rejects or reads as other prefixes
+        if not (prefix.isascii() and prefix.isdigit()):
+            return 'Unknown'
+
+        code = int(prefix)
+        return _GS1_PREFIX_TABLE[code] if code < 1000 else 'Unknown'
+
+    def classify_batch(self, barcodes):
+        """Column-wise barcode info for many barcodes at once (bulk catalog scans).
+
+        Returns a dict of NumPy arrays: barcode, length, prefix (-1 when the
+        first three characters aren't digits), is_indian and country.
+        """
+        prefix = np.array([
+            int(b[:3]) if len(b) >= 3 and b[:3].isascii() and b[:3].isdigit() else -1
+            for b in barcodes
+        ], dtype=np.int16)
+        india = [int(p) for p in self.INDIA_GS1_PREFIXES]
+        return {
+            'barcode': np.array(barcodes, dtype=str),
+            'length': np.fromiter(map(len, barcodes), dtype=np.int32, count=len(barcodes)),
+            'prefix': prefix,
+            'is_indian': np.isin(prefix, india),
+            # Non-numeric prefixes read the table's trailing 'Unknown' slot
+            'country': _GS1_PREFIX_TABLE_NP[np.where(prefix >= 0, prefix, 1000)],
         }
-        return country_map.get(prefix, 'Unknown')
\ No newline at end of file
+
+
+# Per-process reader for read_images_batch (module-level so it pickles)
+_worker_reader = None
+
+
+def _init_scan_worker():
+    global _worker_reader
+    _worker_reader = BarcodeReader()
+
+
+def _scan_one(image_data):
+    return _worker_reader.read_from_image(image_data)
@@ -0,0 +1,4 @@
+from flask_caching import Cache
+
+# Shared cache (in-process by default, Redis when REDIS_URL is configured)
+cache = Cache()
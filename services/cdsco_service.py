@@ -1,6 +1,18 @@
-import requests
+import logging
+import re
+from functools import lru_cache
+from services import http_session
+from services.name_matcher import compile_name_matcher, names_in
 from config import Config
 
+logger = logging.getLogger(__name__)
+
+# Indian drug license formats
+# Manufacturing: State/Number/Number/Year (e.g., KTK/28/113/2006)
+_MFG_LICENSE_RE = re.compile(r'^[A-Z]{1,3}/\d+/\d+/\d{4}$')
+# Sales: State/Number (e.g., MH/15234)
+_SIMPLE_LICENSE_RE = re.compile(r'^[A-Z]{1,3}[-/]\d+$')
+
 
 class CDSCOService:
     """
@@ -163,6 +175,35 @@ class CDSCOService:
         },
     ]
 
+    # Banned drugs keyed by the lowercase name matched against compositions
+    _BANNED_BY_NAME = {drug['name'].split('(')[0].strip().lower(): drug for drug in BANNED_DRUGS}
+    # All names in one matcher, so a composition is scanned once instead of once per drug
+    _BANNED_MATCHER = compile_name_matcher(_BANNED_BY_NAME)
+
+    # Known drug interaction pairs
+    KNOWN_INTERACTIONS = {
+        ('paracetamol', 'warfarin'): {
+            'severity': 'moderate',
+            'description': 'Paracetamol may enhance the anticoagulant effect of Warfarin',
+        },
+        ('azithromycin', 'warfarin'): {
+            'severity': 'major',
+            'description': 'Azithromycin may increase Warfarin levels, increasing bleeding risk',
+        },
+        ('omeprazole', 'clopidogrel'): {
+            'severity': 'major',
+            'description': 'Omeprazole may reduce the effectiveness of Clopidogrel',
+        },
+        ('metformin', 'alcohol'): {
+            'severity': 'major',
+            'description': 'Risk of lactic acidosis increases with alcohol use',
+        },
+    }
+    # Every drug named in an interaction pair, found in one pass over the compositions
+    _INTERACTION_MATCHER = compile_name_matcher(
+        drug for pair in KNOWN_INTERACTIONS for drug in pair
+    )
+
     # Fixed Dose Combinations banned in India
     BANNED_FDCS = [
         'Nimesulide + Paracetamol (for children)',
@@ -174,7 +215,7 @@ class CDSCOService:
 
     def __init__(self):
         self.base_url = Config.CDSCO_API_BASE
-        self.session = requests.Session()
+        self.session = http_session.session
 
     def search_medicine(self, barcode):
         """
@@ -185,8 +226,8 @@ class CDSCOService:
         try:
             # Placeholder for future CDSCO API integration
             return None
-        except Exception as e:
-            print(f"CDSCO search error: {e}")
+        except Exception:
+            logger.exception("CDSCO search error")
             return None
 
     def get_drug_schedule(self, schedule_code):
@@ -198,12 +239,13 @@ class CDSCOService:
         if not composition:
             return []
 
-        warnings = []
-        composition_lower = composition.lower()
+        found = self._find_banned_names(composition.lower())
+        if not found:
+            return []
 
-        for drug in self.BANNED_DRUGS:
-            drug_name = drug['name'].split('(')[0].strip().lower()
-            if drug_name in composition_lower:
+        warnings = []
+        for drug_name, drug in self._BANNED_BY_NAME.items():
+            if drug_name in found:
                 warnings.append({
                     'type': 'banned_drug',
                     'severity': 'critical',
@@ -215,28 +257,48 @@ class CDSCOService:
 
         return warnings
 
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _find_banned_names(composition_lower):
+        """Banned drug names in a composition (cached: the same compositions repeat across scans)"""
+        return frozenset(names_in(CDSCOService._BANNED_MATCHER, composition_lower))
+
     def find_generic_alternatives(self, brand_name=None, composition=None):
         """
         Find cheaper generic alternatives and Jan Aushadhi options
         
         Jan Aushadhi: Indian government's scheme for affordable generic medicines
         """
-        alternatives = []
-
         search_term = (brand_name or '').lower()
         composition_term = (composition or '').lower()
 
-        for key, medicine in self.GENERIC_MEDICINES.items():
-            # Search by brand name
-            brand_match = any(
-                search_term in brand['name'].lower()
-                for brand in medicine['brands']
-            )
-            # Search by composition
-            comp_match = medicine['generic_name'].lower() in composition_term
-
-            if brand_match or comp_match:
-                alternatives.append({
+        # Medicines with a brand name containing the search term
+        brand_matches = self._BRAND_SUBSTRING_INDEX.get(search_term, ())
+
+        alternatives = []
+        for i, (generic_name, alternative) in enumerate(self._GENERIC_INDEX):
+            if i in brand_matches or generic_name in composition_term:
+                alternatives.append(dict(alternative))
+
+        return alternatives
+
+    @classmethod
+    def _prepare_generic_index(cls):
+        """Precompute the sorted brands, price extremes and savings for each medicine"""
+        cls._GENERIC_INDEX = []
+        # Every substring of every brand name -> medicine positions, so a partial
+        # brand search is one dict lookup (brand names are short, so this stays small)
+        substring_index = {}
+        for i, medicine in enumerate(cls.GENERIC_MEDICINES.values()):
+            for brand in medicine['brands']:
+                name = brand['name'].lower()
+                for start in range(len(name) + 1):
+                    for end in range(start, len(name) + 1):
+                        substring_index.setdefault(name[start:end], set()).add(i)
+
+            cls._GENERIC_INDEX.append((
+                medicine['generic_name'].lower(),
+                {
                     'generic_name': medicine['generic_name'],
                     'strength': medicine['strength'],
                     'brands': sorted(medicine['brands'], key=lambda x: x['mrp']),
@@ -244,13 +306,17 @@ class CDSCOService:
                     'most_expensive': max(medicine['brands'], key=lambda x: x['mrp']),
                     'jan_aushadhi_available': medicine.get('jan_aushadhi_available', False),
                     'jan_aushadhi_price': medicine.get('jan_aushadhi_price'),
-                    'potential_savings': self._calculate_savings(medicine),
+                    'potential_savings': cls._calculate_savings(medicine),
                     'schedule': medicine.get('schedule', 'Unknown'),
-                })
+                },
+            ))
 
-        return alternatives
+        cls._BRAND_SUBSTRING_INDEX = {
+            term: frozenset(positions) for term, positions in substring_index.items()
+        }
 
-    def _calculate_savings(self, medicine):
+    @staticmethod
+    def _calculate_savings(medicine):
         """Calculate potential savings with generic/Jan Aushadhi"""
         if not medicine.get('jan_aushadhi_available'):
             return None
@@ -273,30 +339,12 @@ class CDSCOService:
         Check for known drug interactions
         Note: This is a simplified version. Use actual medical databases in production.
         """
-        known_interactions = {
-            ('paracetamol', 'warfarin'): {
-                'severity': 'moderate',
-                'description': 'Paracetamol may enhance the anticoagulant effect of Warfarin',
-            },
-            ('azithromycin', 'warfarin'): {
-                'severity': 'major',
-                'description': 'Azithromycin may increase Warfarin levels, increasing bleeding risk',
-            },
-            ('omeprazole', 'clopidogrel'): {
-                'severity': 'major',
-                'description': 'Omeprazole may reduce the effectiveness of Clopidogrel',
-            },
-            ('metformin', 'alcohol'): {
-                'severity': 'major',
-                'description': 'Risk of lactic acidosis increases with alcohol use',
-            },
-        }
-
-        interactions = []
         comp_lower = [c.lower().strip() for c in compositions]
+        present = names_in(self._INTERACTION_MATCHER, ' '.join(comp_lower))
 
-        for (drug1, drug2), info in known_interactions.items():
-            if drug1 in ' '.join(comp_lower) and drug2 in ' '.join(comp_lower):
+        interactions = []
+        for (drug1, drug2), info in self.KNOWN_INTERACTIONS.items():
+            if drug1 in present and drug2 in present:
                 interactions.append({
                     'drugs': f"{drug1} + {drug2}",
                     'severity': info['severity'],
@@ -317,26 +365,19 @@ class CDSCOService:
             result['message'] = 'No license number provided'
             return result
 
-        # Indian drug license format patterns
-        # Manufacturing: State/Number/Year (e.g., KTK/28/113/2006)
-        # Sales: State/Number (e.g., MH/15234)
-        import re
-
-        # Manufacturing license pattern
-        mfg_pattern = r'^[A-Z]{1,3}/\d+/\d+/\d{4}$'
-        # Simple license pattern
-        simple_pattern = r'^[A-Z]{1,3}[-/]\d+$'
-
-        if re.match(mfg_pattern, license_number):
+        if _MFG_LICENSE_RE.match(license_number):
             result['format_valid'] = True
             result['license_type'] = 'Manufacturing License'
             parts = license_number.split('/')
             result['state_code'] = parts[0]
             result['year'] = parts[-1]
-        elif re.match(simple_pattern, license_number):
+        elif _SIMPLE_LICENSE_RE.match(license_number):
             result['format_valid'] = True
             result['license_type'] = 'Drug License'
         else:
             result['message'] = 'Unrecognized license format'
 
-        return result
\ No newline at end of file
+        return result
+
+
+CDSCOService._prepare_generic_index()
@@ -0,0 +1,33 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = 'IndianBarcodeScanner/1.0 (contact@example.com)'
+
+
+def _build_session():
+    session = requests.Session()
+    session.headers.update({'User-Agent': USER_AGENT})
+
+    # Keep connections alive across scans; retry idempotent GETs on gateway
+    # errors only (connect errors and read timeouts aren't retried, so a
+    # request's timeout stays its worst case)
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=50,
+        max_retries=Retry(
+            total=2,
+            connect=0,
+            read=0,
+            backoff_factor=0.1,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=['GET', 'HEAD'],
+        ),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# Shared by every external API service so they reuse one connection pool
+session = _build_session()
@@ -0,0 +1,503 @@
+import io
+
+import numpy as np
+
+# Pillow is imported once here; without it scan_image_bytes reports it missing
+try:
+    from PIL import Image, ImageEnhance, ImageFilter
+except ImportError:
+    Image = ImageEnhance = ImageFilter = None
+
+# pyzbar is optional; imported once here rather than in every _try_pyzbar_* call
+try:
+    from pyzbar.pyzbar import decode as _pyzbar_decode, ZBarSymbol
+    _PYZBAR_SYMBOLS = (
+        ZBarSymbol.EAN13,
+        ZBarSymbol.EAN8,
+        ZBarSymbol.UPCA,
+        ZBarSymbol.UPCE,
+        ZBarSymbol.CODE128,
+        ZBarSymbol.CODE39,
+        ZBarSymbol.QRCODE,
+    )
+except (ImportError, FileNotFoundError):
+    _pyzbar_decode = None
+
+# zxing-cpp is a second native decoder: one call also covers rotated and
+# downscaled variants, so it runs before the slower pyzbar fallbacks
+try:
+    import zxingcpp
+    _ZXING_FORMATS = zxingcpp.barcode_formats_from_str(
+        'EAN13,EAN8,UPCA,UPCE,CODE128,CODE39,QRCODE'
+    )
+except ImportError:
+    zxingcpp = None
+
+# Optional: numba JIT for the scanline decoder (plain Python is used without it)
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+# EAN-13 digit encodings (bar = 1), looked up as 7-bit ints packed MSB first
+_L_CODES = ['0001101', '0011001', '0010011', '0111101', '0100011',
+            '0110001', '0101111', '0111011', '0110111', '0001011']
+_G_CODES = ['0100111', '0110011', '0011011', '0100001', '0011101',
+            '0111001', '0000101', '0010001', '0001001', '0010111']
+_R_CODES = ['1110010', '1100110', '1101100', '1000010', '1011100',
+            '1001110', '1010000', '1000100', '1001000', '1110100']
+# L/G parity of the six left digits encodes the first digit (G = 1)
+_FIRST_CODES = ['000000', '001011', '001101', '001110', '010011',
+                '011001', '011100', '010101', '010110', '011010']
+
+# Binarisation tables for the thresholded pyzbar pass (pixel > t -> white)
+_THRESHOLD_LUTS = tuple(
+    [0] * (t + 1) + [255] * (255 - t) for t in (100, 120, 140, 160)
+)
+
+
+def _code_lut(codes, size):
+    table = [-1] * size
+    for digit, code in enumerate(codes):
+        table[int(code, 2)] = digit
+    return tuple(table)
+
+
+_L_LUT = _code_lut(_L_CODES, 128)
+_G_LUT = _code_lut(_G_CODES, 128)
+_R_LUT = _code_lut(_R_CODES, 128)
+_FIRST_LUT = _code_lut(_FIRST_CODES, 64)
+
+
+# An EAN-13 symbol is 59 alternating runs, bar first, spanning 95 modules:
+# 3 guard runs, 6 digits of 4 runs, 5 centre guard runs, 6 digits, 3 guard runs
+_EAN13_RUNS = 59
+_EAN13_MODULES = 95
+_EAN13_RUN_COLOURS = np.arange(_EAN13_RUNS, dtype=np.uint8) % 2 ^ 1
+
+
+def _module_samples(binary):
+    """
+    Resample a 0/1 scanline to one sample per module for every EAN-13 candidate.
+
+    Each bar run that begins a 59-run span is a candidate. Every digit spans
+    exactly 7 modules, so its four run widths are scaled against its own
+    width, which reads barcodes at any scale (and tolerates uneven printing).
+    Returns the well-formed candidates' 95 samples back to back.
+    """
+    # Run boundaries; run i covers bounds[i]:bounds[i + 1]
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(binary)) + 1, [len(binary)]))
+    first = np.arange(len(bounds) - _EAN13_RUNS)
+    first = first[binary[bounds[first]] == 1]
+    if len(first) == 0:
+        return np.empty(0, dtype=np.uint8)
+
+    widths = np.diff(bounds)[first[:, np.newaxis] + np.arange(_EAN13_RUNS)]
+    modules = np.ones_like(widths)
+    for lo in (3, 32):
+        digits = widths[:, lo:lo + 24].reshape(len(first), 6, 4)
+        scaled = np.rint(digits * 7 / digits.sum(axis=2, keepdims=True))
+        modules[:, lo:lo + 24] = np.clip(scaled, 1, 4).reshape(len(first), 24)
+
+    # Only candidates whose digits all came out 7 modules wide line up
+    modules = modules[modules.sum(axis=1) == _EAN13_MODULES]
+    colours = np.tile(_EAN13_RUN_COLOURS, len(modules))
+    return np.repeat(colours, modules.ravel())
+
+
+def _window_codes(binary):
+    """7-bit value of the window starting at every position of a 0/1 scanline."""
+    n = len(binary) - 6
+    codes = np.zeros(n, dtype=np.uint8)
+    for j in range(7):
+        codes = (codes << 1) | binary[j:j + n]
+    return codes
+
+
+def _scan_ean13(codes, starts):
+    """First valid EAN-13 at one of `starts` in the window codes (-1 if none)."""
+    for start in starts:
+        pos = start + 3
+        code = 0
+        parity = 0
+        weighted = 0
+        found = True
+
+        # Left half: L or G codes; their parity pattern gives the first digit
+        for d in range(6):
+            pattern = codes[pos]
+            digit = _L_LUT[pattern]
+            if digit >= 0:
+                parity <<= 1
+            else:
+                digit = _G_LUT[pattern]
+                if digit < 0:
+                    found = False
+                    break
+                parity = (parity << 1) | 1
+            code = code * 10 + digit
+            weighted += digit * (3 if d % 2 == 0 else 1)
+            pos += 7
+        if not found:
+            continue
+
+        # Skip the centre guard, then the right half (R codes)
+        pos += 5
+        for d in range(6):
+            digit = _R_LUT[codes[pos]]
+            if digit < 0:
+                found = False
+                break
+            code = code * 10 + digit
+            if d < 5:
+                weighted += digit * (3 if d % 2 == 0 else 1)
+            pos += 7
+        if not found:
+            continue
+
+        first_digit = _FIRST_LUT[parity]
+        if first_digit < 0:
+            continue
+
+        weighted += first_digit
+        if (10 - weighted % 10) % 10 == code % 10:
+            return first_digit * 10 ** 12 + code
+    return -1
+
+
+_scan_ean13_jit = njit(cache=True)(_scan_ean13) if njit is not None else None
+
+
+class ImageBarcodeScanner:
+    """
+    Server-side barcode scanner.
+    Uses pyzbar (powerful, finds barcodes in complex images), then zxing-cpp.
+    Falls back to pure Python if neither is available.
+    """
+
+    # Images with a side above MAX_IMAGE_DIM are downscaled to fit DOWNSCALE_DIM
+    MAX_IMAGE_DIM = 2000
+    DOWNSCALE_DIM = 1600
+
+    def scan_image_bytes(self, image_bytes):
+        """
+        Scan image bytes for barcodes.
+        Returns (barcode_string, None) on success.
+        Returns (None, error_message) on failure.
+        """
+        if Image is None:
+            return None, 'Pillow not installed'
+
+        try:
+            img = Image.open(io.BytesIO(image_bytes))
+        except Exception as e:
+            return None, 'Cannot open image: ' + str(e)
+
+        # Phone photos are far larger than zbar needs: shrink once, up front,
+        # and let every strategy below work on the smaller image
+        if max(img.size) > self.MAX_IMAGE_DIM:
+            img.thumbnail((self.DOWNSCALE_DIM, self.DOWNSCALE_DIM), Image.LANCZOS)
+
+        # Strategies run cheapest first and stop at the first hit
+
+        # zbar only reads luminance (pyzbar converts to 'L' itself), so every
+        # strategy works on one grayscale copy and the variants derived from it
+        gray = img.convert('L')
+
+        # Try pyzbar first (best barcode scanner)
+        barcode = self._try_pyzbar(gray)
+        if barcode:
+            return barcode, None
+
+        # Try zxing-cpp on the same image (single native call)
+        barcode = self._try_zxing(gray)
+        if barcode:
+            return barcode, None
+
+        pyramid = self._build_pyramid(gray)
+
+        # Try pyzbar with preprocessed image
+        barcode = self._try_pyzbar_enhanced(pyramid)
+        if barcode:
+            return barcode, None
+
+        # Try pyzbar on scaled versions
+        barcode = self._try_pyzbar_scaled(pyramid)
+        if barcode:
+            return barcode, None
+
+        # Try pyzbar on cropped regions (most decodes, so after the whole-image passes)
+        barcode = self._try_pyzbar_regions(pyramid)
+        if barcode:
+            return barcode, None
+
+        # Try pyzbar on rotated image
+        barcode = self._try_pyzbar_rotated(pyramid)
+        if barcode:
+            return barcode, None
+
+        # Fallback: pure Python line scanner
+        barcode = self._try_pure_python(gray)
+        if barcode:
+            return barcode, None
+
+        return None, 'No barcode detected. Try a clearer photo with the barcode more visible.'
+
+    def _build_pyramid(self, gray):
+        """Image variants shared by the pyzbar strategies, computed once per scan."""
+        width, height = gray.size
+        return {
+            'gray': gray,
+            'half': gray.resize((max(width // 2, 1), max(height // 2, 1)), Image.LANCZOS),
+            'sharpen': gray.filter(ImageFilter.SHARPEN),
+            'contrast2x': ImageEnhance.Contrast(gray).enhance(2.0),
+        }
+
+    def _try_pyzbar(self, img):
+        """Try scanning with pyzbar on original image."""
+        if _pyzbar_decode is None:
+            return None
+
+        try:
+            # Try with all barcode types, then without specifying symbols
+            # (detect any barcode); symbols whose data isn't text are skipped
+            for symbols in (_PYZBAR_SYMBOLS, None):
+                for result in _pyzbar_decode(img, symbols=symbols):
+                    try:
+                        return result.data.decode('utf-8')
+                    except UnicodeDecodeError:
+                        continue
+
+            return None
+        except ImportError:
+            return None
+        except Exception:
+            return None
+
+    def _try_zxing(self, img):
+        """Try scanning with zxing-cpp."""
+        if zxingcpp is None:
+            return None
+
+        try:
+            for result in zxingcpp.read_barcodes(img, formats=_ZXING_FORMATS):
+                if result.valid and result.text:
+                    return result.text
+            return None
+        except Exception:
+            return None
+
+    def _try_pyzbar_enhanced(self, pyramid):
+        """Try scanning with enhanced contrast."""
+        if _pyzbar_decode is None:
+            return None
+
+        try:
+            # Method 1: High contrast
+            results = _pyzbar_decode(pyramid['contrast2x'])
+            if results:
+                return results[0].data.decode('utf-8')
+
+            # Method 2: Sharpen
+            results = _pyzbar_decode(pyramid['sharpen'])
+            if results:
+                return results[0].data.decode('utf-8')
+
+            # Method 3: Threshold the grayscale image
+            gray = pyramid['gray']
+            # Try multiple thresholds
+            for lut in _THRESHOLD_LUTS:
+                bw = gray.point(lut, '1')
+                results = _pyzbar_decode(bw)
+                if results:
+                    return results[0].data.decode('utf-8')
+
+            # Method 4: High sharpness + contrast
+            sharp = pyramid['sharpen'].filter(ImageFilter.SHARPEN)
+            enhancer2 = ImageEnhance.Contrast(sharp)
+            sharp_contrast = enhancer2.enhance(2.5)
+            results = _pyzbar_decode(sharp_contrast)
+            if results:
+                return results[0].data.decode('utf-8')
+
+            # Method 5: Increase brightness then contrast
+            bright = ImageEnhance.Brightness(pyramid['gray']).enhance(1.3)
+            bright_contrast = ImageEnhance.Contrast(bright).enhance(2.0)
+            results = _pyzbar_decode(bright_contrast)
+            if results:
+                return results[0].data.decode('utf-8')
+
+            return None
+        except ImportError:
+            return None
+        except Exception:
+            return None
+
+    def _try_pyzbar_regions(self, pyramid):
+        """Try scanning different cropped regions of the image."""
+        if _pyzbar_decode is None:
+            return None
+
+        try:
+            gray = pyramid['gray']
+            width, height = gray.size
+
+            # zbar already scanned the whole image (plain and contrast-enhanced),
+            # so a crop only helps when contrast is stretched for that region
+            # alone. Packaging barcodes sit low or central, so try just those.
+            regions = [
+                # Bottom half
+                (0, height // 2, width, height),
+                # Center 60%
+                (int(width * 0.1), int(height * 0.2), int(width * 0.9), int(height * 0.8)),
+            ]
+
+            for region in regions:
+                try:
+                    enhanced = ImageEnhance.Contrast(gray.crop(region)).enhance(2.0)
+                    results = _pyzbar_decode(enhanced)
+                    if results:
+                        return results[0].data.decode('utf-8')
+                except Exception:
+                    continue
+
+            return None
+        except ImportError:
+            return None
+        except Exception:
+            return None
+
+    def _try_pyzbar_scaled(self, pyramid):
+        """Try scanning at different scales (zoom in/out)."""
+        if _pyzbar_decode is None:
+            return None
+
+        try:
+            gray = pyramid['gray']
+            width, height = gray.size
+
+            # Try scaling up (for small barcodes in large photos)
+            for scale in [1.5, 2.0, 2.5, 3.0, 0.75, 0.5]:
+                try:
+                    new_w = int(width * scale)
+                    new_h = int(height * scale)
+
+                    # Don't make image too large
+                    if new_w > 4000 or new_h > 4000:
+                        continue
+                    if new_w < 100 or new_h < 100:
+                        continue
+
+                    if scale == 0.5:
+                        scaled = pyramid['half']
+                    else:
+                        scaled = gray.resize((new_w, new_h), Image.LANCZOS)
+                    results = _pyzbar_decode(scaled)
+                    if results:
+                        return results[0].data.decode('utf-8')
+                except Exception:
+                    continue
+
+            return None
+        except ImportError:
+            return None
+        except Exception:
+            return None
+
+    def _try_pyzbar_rotated(self, pyramid):
+        """Try scanning rotated versions."""
+        if _pyzbar_decode is None:
+            return None
+
+        try:
+            for angle in [90, 180, 270]:
+                try:
+                    rotated = pyramid['gray'].rotate(angle, expand=True)
+                    results = _pyzbar_decode(rotated)
+                    if results:
+                        return results[0].data.decode('utf-8')
+                except Exception:
+                    continue
+
+            return None
+        except ImportError:
+            return None
+        except Exception:
+            return None
+
+    def _try_pure_python(self, img):
+        """Fallback: Pure Python line-by-line EAN-13 scanner."""
+        try:
+            # One uint8 array for the whole image instead of a Python int per pixel
+            pixels = np.asarray(img.convert('L'), dtype=np.uint8)
+            height, width = pixels.shape
+
+            if width < 100:
+                return None
+
+            barcodes_found = {}
+
+            # One Otsu threshold over all sampled scanlines instead of one per row.
+            # Pixels at or below it are the dark class, i.e. bars (= 1).
+            rows = pixels[[int(height * line_pct / 100) for line_pct in range(15, 85, 2)]]
+            threshold = self._otsu_threshold(rows.ravel())
+            binary_rows = (rows <= threshold).astype(np.uint8)
+
+            for barcode in self._find_ean13_rows(binary_rows):
+                if barcode:
+                    barcodes_found[barcode] = barcodes_found.get(barcode, 0) + 1
+
+            if barcodes_found:
+                return max(barcodes_found, key=barcodes_found.get)
+
+            return None
+        except Exception:
+            return None
+
+    def _otsu_threshold(self, pixels):
+        """Calculate Otsu's threshold."""
+        if len(pixels) == 0:
+            return 128
+
+        # Between-class variance for every candidate threshold at once
+        histogram = np.bincount(np.asarray(pixels, dtype=np.uint8), minlength=256)
+        levels = np.arange(256)
+        weight_bg = np.cumsum(histogram)
+        weight_fg = len(pixels) - weight_bg
+        sum_bg = np.cumsum(levels * histogram)
+        sum_total = sum_bg[-1]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_bg = sum_bg / weight_bg
+            mean_fg = (sum_total - sum_bg) / weight_fg
+            variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        variance[(weight_bg == 0) | (weight_fg == 0)] = 0
+
+        threshold = int(np.argmax(variance))
+        return threshold if variance[threshold] > 0 else 128
+
+    def _find_ean13(self, binary):
+        """Find EAN-13 barcode in binary line."""
+        return self._find_ean13_rows(np.asarray(binary, dtype=np.uint8)[np.newaxis])[0]
+
+    def _find_ean13_rows(self, binary_rows):
+        """Find an EAN-13 barcode on each row of a 2-D binary array (None where absent)."""
+        found = []
+        for binary in binary_rows:
+            samples = _module_samples(binary)
+            if len(samples) == 0:
+                found.append(None)
+                continue
+
+            # Candidates sit every 95 samples; each 7-module digit is then read
+            # as one precomputed window code
+            codes = _window_codes(samples)
+            starts = np.arange(0, len(samples), _EAN13_MODULES)
+            if _scan_ean13_jit is not None:
+                code = _scan_ean13_jit(codes, starts)
+            else:
+                # Plain lists index much faster than ndarrays in interpreted code
+                code = _scan_ean13(codes.tolist(), starts.tolist())
+            found.append(f'{code:013d}' if code >= 0 else None)
+        return found
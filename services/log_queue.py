@@ -0,0 +1,44 @@
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# The app's own packages log at INFO; everything else (root) stays at WARNING
+APP_LOGGERS = ('services', 'scanners', 'database')
+
+# Records are queued by the logging call and written to stderr by a listener
+# thread, so a request never waits on the stream write
+_log_queue = queue.SimpleQueue()
+_listener = None
+
+
+def _start_listener():
+    global _listener
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    _listener = QueueListener(_log_queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def configure_logging(level=logging.INFO):
+    """Send the root logger's records through the queue (idempotent)"""
+    if _listener is not None:
+        return
+
+    logging.getLogger().addHandler(QueueHandler(_log_queue))
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(level)
+
+    _start_listener()
+    atexit.register(_stop_listener)
+    # The listener thread doesn't survive a fork (gunicorn --preload), so each
+    # worker starts its own
+    os.register_at_fork(after_in_child=_start_listener)
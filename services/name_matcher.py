@@ -0,0 +1,28 @@
+import re
+
+
+def compile_name_matcher(names):
+    """
+    One regex over all names, plus the names contained in each name.
+
+    The lookahead pattern reports the longest name starting at every position
+    in a single scan of the text; any shorter name that occurs is contained in
+    one of those, so together they give exactly the names present.
+    """
+    names = sorted(set(names), key=len, reverse=True)
+    if not names:
+        return None
+    pattern = re.compile('(?=(' + '|'.join(map(re.escape, names)) + '))')
+    contained = {name: frozenset(other for other in names if other in name) for name in names}
+    return pattern, contained
+
+
+def names_in(matcher, text):
+    """Names from compile_name_matcher that occur in text"""
+    found = set()
+    if matcher is None:
+        return found
+    pattern, contained = matcher
+    for match in pattern.finditer(text):
+        found |= contained[match.group(1)]
+    return found
@@ -1,33 +1,85 @@
+import logging
+from copy import copy
+
+import orjson
 import requests
 
+from services import http_session
+
+logger = logging.getLogger(__name__)
+
 
 class OpenFoodFactsService:
     """Service to interact with Open Food Facts API for product data"""
 
     BASE_URL = "https://world.openfoodfacts.org/api/v2"
 
+    # Fields kept by _format_product, with the value used when one is missing
+    PRODUCT_DEFAULTS = {
+        'product_name': 'Unknown',
+        'brands': '',
+        'generic_name': '',
+        'quantity': '',
+        'categories': '',
+        'countries': '',
+        'manufacturing_places': '',
+        'ingredients_text': '',
+        'allergens': '',
+        'nutriments': {},
+        'nutrition_grades': '',
+        'nova_group': '',
+        'ecoscore_grade': '',
+        'image_url': '',
+        'image_front_url': '',
+        'labels': '',
+        'stores': '',
+        'code': '',
+    }
+
+    # Only request those fields; full product documents are far larger
+    PRODUCT_FIELDS = ','.join(PRODUCT_DEFAULTS)
+    # Fields whose default is a dict or list, copied for each product
+    _CONTAINER_FIELDS = tuple(
+        field for field, default in PRODUCT_DEFAULTS.items() if isinstance(default, (dict, list))
+    )
+
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'IndianBarcodeScanner/1.0 (contact@example.com)'
-        })
+        self.session = http_session.session
 
     def get_product(self, barcode):
         """Get product details by barcode from Open Food Facts"""
+        return self.get_product_status(barcode)[0]
+
+    def get_product_status(self, barcode):
+        """
+        Look up a barcode, telling a confirmed miss apart from a failure.
+
+        Returns (product, answered): answered is True when Open Food Facts
+        gave a definite answer (the product, or that it doesn't know the
+        barcode) and False when the lookup failed (timeout, rate limit,
+        server error, bad JSON), in which case product is None.
+        """
         try:
             url = self.BASE_URL + "/product/" + str(barcode) + ".json"
-            response = self.session.get(url, timeout=10)
+            params = {'fields': self.PRODUCT_FIELDS}
+            response = self.session.get(url, params=params, timeout=10)
 
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('status') == 1:
-                    product = data.get('product', {})
-                    return self._format_product(product)
-            return None
+            # Unknown barcodes come back as 404 (or 200 with status 0)
+            if response.status_code == 404:
+                return None, True
+            if response.status_code != 200:
+                logger.warning("Open Food Facts API returned HTTP %s", response.status_code)
+                return None, False
+
+            data = orjson.loads(response.content)
+            if data.get('status') == 1:
+                product = data.get('product', {})
+                return self._format_product(product), True
+            return None, True
 
-        except requests.RequestException as e:
-            print("Open Food Facts API error: " + str(e))
-            return None
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            logger.warning("Open Food Facts API error: %s", e)
+            return None, False
 
     def search_products(self, query, country='india', page=1, page_size=20):
         """Search products on Open Food Facts"""
@@ -40,41 +92,31 @@ class OpenFoodFactsService:
                 'page': page,
                 'page_size': page_size,
                 'countries_tags_en': country,
+                'fields': self.PRODUCT_FIELDS,
             }
             response = self.session.get(url, params=params, timeout=10)
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 products = data.get('products', [])
                 return [self._format_product(p) for p in products]
             return []
 
-        except requests.RequestException as e:
-            print("Open Food Facts search error: " + str(e))
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            logger.warning("Open Food Facts search error: %s", e)
             return []
 
     def _format_product(self, product_data):
         """Format Open Food Facts product data"""
-        return {
-            'product_name': product_data.get('product_name', 'Unknown'),
-            'brands': product_data.get('brands', ''),
-            'generic_name': product_data.get('generic_name', ''),
-            'quantity': product_data.get('quantity', ''),
-            'categories': product_data.get('categories', ''),
-            'countries': product_data.get('countries', ''),
-            'manufacturing_places': product_data.get('manufacturing_places', ''),
-            'ingredients_text': product_data.get('ingredients_text', ''),
-            'allergens': product_data.get('allergens', ''),
-            'nutriments': product_data.get('nutriments', {}),
-            'nutrition_grades': product_data.get('nutrition_grades', ''),
-            'nova_group': product_data.get('nova_group', ''),
-            'ecoscore_grade': product_data.get('ecoscore_grade', ''),
-            'image_url': product_data.get('image_url', ''),
-            'image_front_url': product_data.get('image_front_url', ''),
-            'labels': product_data.get('labels', ''),
-            'stores': product_data.get('stores', ''),
-            'code': product_data.get('code', ''),
+        product = {
+            field: product_data.get(field, default)
+            for field, default in self.PRODUCT_DEFAULTS.items()
         }
+        # Every product gets its own containers rather than the shared defaults
+        for field in self._CONTAINER_FIELDS:
+            if field not in product_data:
+                product[field] = copy(self.PRODUCT_DEFAULTS[field])
+        return product
 
     def get_indian_products(self, category=None, page=1):
         """Get products specifically from India"""
@@ -83,11 +125,11 @@ class OpenFoodFactsService:
             if category:
                 url = "https://world.openfoodfacts.org/country/india/category/" + str(category) + ".json"
 
-            params = {'page': page}
+            params = {'page': page, 'fields': self.PRODUCT_FIELDS}
             response = self.session.get(url, params=params, timeout=10)
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 products = data.get('products', [])
                 return {
                     'products': [self._format_product(p) for p in products],
@@ -97,6 +139,6 @@ class OpenFoodFactsService:
                 }
             return {'products': [], 'count': 0}
 
-        except requests.RequestException as e:
-            print("Error fetching Indian products: " + str(e))
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            logger.warning("Error fetching Indian products: %s", e)
             return {'products': [], 'count': 0}
\ No newline at end of file
@@ -1,17 +1,83 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only, lazyload
 from database.models import db, Product, ScanHistory, BannedIngredient
+from scanners.barcode_reader import BARCODE_RE, BarcodeReader
 from services.openfoodfacts import OpenFoodFactsService
 from services.fssai_service import FSSAIService
 from services.cdsco_service import CDSCOService
+from services.cache import cache
+from services.name_matcher import compile_name_matcher, names_in
+from services.scan_log_writer import ScanLogWriter
 from datetime import datetime
+import time
+
+logger = logging.getLogger(__name__)
+
+# EAN-13 prefixes GS1 reserves for things that aren't food, cosmetics or
+# medicines (ISSN serials, ISBN books, refund receipts, coupons); no external
+# source has them
+_NON_PRODUCT_EAN13_PREFIXES = ('977', '978', '979', '980', '981', '982', '983', '984', '99')
+
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING
+_CONFLICT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
 
 
 class ProductService:
     """Main service for product lookup from multiple Indian databases"""
 
+    PRODUCT_CACHE_TIMEOUT = 3600  # seconds
+    OFF_CACHE_TIMEOUT = 86400  # seconds to keep an Open Food Facts product
+    OFF_MISS_CACHE_TIMEOUT = 600  # seconds before asking again about an unknown barcode
+    BANNED_CACHE_TIMEOUT = 300  # seconds to reuse the banned-ingredient table
+    LOOKUP_WORKERS = 8  # threads for the external API lookups (3 per scan)
+
+    # Product category -> (banned-ingredient categories to check, add health advisories)
+    INGREDIENT_CHECKS = {
+        'skincare': (frozenset({'cosmetic'}), False),
+        'haircare': (frozenset({'cosmetic'}), False),
+        'medicine': (frozenset({'drug'}), False),
+        'food': (frozenset({'food'}), True),
+        'nutraceutical': (frozenset({'food'}), False),
+    }
+    DEFAULT_INGREDIENT_CHECK = (frozenset({'food', 'cosmetic', 'drug'}), False)
+
+    # Health advisories for food: (attribute, limit it must exceed, severity, message)
+    HEALTH_RULES = (
+        ('sodium_mg', 600, 'medium',
+         '⚠️ High sodium content. WHO recommends less than 2000mg sodium per day.'),
+        ('sugar_g', 12, 'medium', '⚠️ High sugar content per serving.'),
+        ('trans_fat_g', 0, 'high',
+         '⚠️ Contains trans fat. FSSAI recommends zero trans fat intake.'),
+    )
+
     def __init__(self):
         self.off_service = OpenFoodFactsService()
         self.fssai_service = FSSAIService()
         self.cdsco_service = CDSCOService()
+        self.barcode_reader = BarcodeReader()
+        # External lookups are network-bound, so they run side by side
+        self.lookup_pool = ThreadPoolExecutor(
+            max_workers=self.LOOKUP_WORKERS, thread_name_prefix='product-lookup'
+        )
+        # Whole banned-ingredient table as (category, name_lower, warning), loaded at once
+        self._banned_rows = None
+        self._banned_loaded_at = 0.0
+        # frozenset of categories -> ([(name_lower, warning), ...], name matcher)
+        self._banned_by_categories = {}
+        # barcode -> Future for the lookup in progress (see _find_product_once)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.scan_log = ScanLogWriter(
+            on_flush=lambda: cache.delete_memoized(self.get_scan_history)
+        )
 
     def lookup_product(self, barcode, scan_method='manual', request=None):
         """
@@ -29,58 +95,159 @@ class ProductService:
             'alternatives': [],
         }
 
-        # Step 1: Check local database first
-        product = Product.query.filter_by(barcode=barcode).first()
-        if product:
-            result['found'] = True
-            result['product'] = product.to_dict()
-            result['source'] = 'Local Indian Database'
-            # Check for banned ingredients
-            result['warnings'] = self._check_banned_ingredients(product)
-            self._log_scan(barcode, product.id, scan_method, True, 'local_db', request)
+        # Malformed input can't match any product; skip the database and APIs
+        if not barcode or not BARCODE_RE.fullmatch(barcode):
+            result['message'] = 'Invalid barcode format'
             return result
 
-        # Step 2: Try Open Food Facts API
-        off_product = self.off_service.get_product(barcode)
+        found, product_id, data_source = self._find_product_once(barcode)
+        result.update(found)
+        self._log_scan(barcode, product_id, scan_method, bool(found), data_source, request)
+
+        if not found:
+            result['message'] = 'Product not found in any Indian database'
+            result['barcode_info'] = self._get_barcode_details(barcode)
+
+        return result
+
+    def _find_product_once(self, barcode):
+        """
+        _find_product, shared by concurrent scans of the same barcode.
+
+        The first scan does the lookup; scans arriving while it runs wait for
+        its answer instead of repeating the database query and API calls.
+        """
+        with self._inflight_lock:
+            flight = self._inflight.get(barcode)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[barcode] = Future()
+
+        if not leader:
+            return flight.result()
+
+        try:
+            flight.set_result(self._find_product(barcode))
+        except Exception as e:
+            flight.set_exception(e)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[barcode]
+        return flight.result()
+
+    def _find_product(self, barcode):
+        """
+        Look a barcode up in priority order.
+
+        Returns (result fields, product id, data source); the fields are empty
+        when no source knows the product.
+        """
+        # Step 1: Check local database first (serialized product cached per barcode)
+        cached = self._get_cached_product(barcode)
+        if cached:
+            return {
+                'found': True,
+                'product': cached['product'],
+                'source': 'Local Indian Database',
+                'warnings': cached['warnings'],
+            }, cached['product_id'], 'local_db'
+
+        if len(barcode) == 13 and barcode.startswith(_NON_PRODUCT_EAN13_PREFIXES):
+            return {}, None, None
+
+        # Steps 2-4 query external services concurrently; results are still
+        # used in priority order
+        off_cached = cache.get(f"off_product:{barcode}")
+        if off_cached is None:
+            off_future = self.lookup_pool.submit(self.off_service.get_product_status, barcode)
+        fallbacks = []
+        if not off_cached:
+            fssai_future = self.lookup_pool.submit(self.fssai_service.search_product, barcode)
+            cdsco_future = self.lookup_pool.submit(self.cdsco_service.search_medicine, barcode)
+            fallbacks = [fssai_future, cdsco_future]
+
+        # Step 2: Try Open Food Facts API (recent answers, including confirmed
+        # misses, are cached; failed lookups aren't)
+        if off_cached is None:
+            off_product, answered = off_future.result()
+            if answered:
+                self._cache_off_product(barcode, off_product)
+        else:
+            off_product = off_cached or None
         if off_product:
-            # Save to local database for future lookups
-            saved_product = self._save_off_product(barcode, off_product)
-            result['found'] = True
-            result['product'] = saved_product.to_dict() if saved_product else off_product
-            result['source'] = 'Open Food Facts'
-            self._log_scan(barcode, saved_product.id if saved_product else None,
-                          scan_method, True, 'openfoodfacts', request)
-            return result
+            # Lower-priority lookups still queued are no longer needed
+            for future in fallbacks:
+                future.cancel()
+            return self._external_hit(
+                barcode, off_product, self._off_product_fields(off_product),
+                'OFF', 'Open Food Facts', 'openfoodfacts',
+            )
 
         # Step 3: Try FSSAI service
-        fssai_product = self.fssai_service.search_product(barcode)
+        fssai_product = fssai_future.result()
         if fssai_product:
-            saved_product = self._save_fssai_product(barcode, fssai_product)
-            result['found'] = True
-            result['product'] = saved_product.to_dict() if saved_product else fssai_product
-            result['source'] = 'FSSAI Database'
-            self._log_scan(barcode, saved_product.id if saved_product else None,
-                          scan_method, True, 'fssai', request)
-            return result
+            cdsco_future.cancel()
+            return self._external_hit(
+                barcode, fssai_product, self._fssai_product_fields(fssai_product),
+                'FSSAI', 'FSSAI Database', 'fssai',
+            )
 
         # Step 4: Try CDSCO service (for medicines)
-        cdsco_product = self.cdsco_service.search_medicine(barcode)
+        cdsco_product = cdsco_future.result()
         if cdsco_product:
-            saved_product = self._save_cdsco_product(barcode, cdsco_product)
-            result['found'] = True
-            result['product'] = saved_product.to_dict() if saved_product else cdsco_product
-            result['source'] = 'CDSCO Database'
-            self._log_scan(barcode, saved_product.id if saved_product else None,
-                          scan_method, True, 'cdsco', request)
-            return result
+            return self._external_hit(
+                barcode, cdsco_product, self._cdsco_product_fields(cdsco_product),
+                'CDSCO', 'CDSCO Database', 'cdsco',
+            )
 
         # Product not found
-        self._log_scan(barcode, None, scan_method, False, None, request)
-        result['found'] = False
-        result['message'] = 'Product not found in any Indian database'
-        result['barcode_info'] = self._get_barcode_details(barcode)
+        return {}, None, None
 
-        return result
+    def _external_hit(self, barcode, raw_product, fields, source_name, source, data_source):
+        """
+        _find_product answer for a product found by an external service.
+
+        The product is saved to the local database for future lookups; the
+        stored row's serialization is returned, or the service's own data if
+        saving failed.
+        """
+        saved = self._save_product(barcode, fields, source_name)
+        return {
+            'found': True,
+            'product': saved['product'] if saved else raw_product,
+            'source': source,
+        }, saved['product_id'] if saved else None, data_source
+
+    def _get_cached_product(self, barcode):
+        """Get serialized local product and its warnings, using the cache when possible"""
+        cache_key = f"product:{barcode}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        product = Product.query.filter_by(barcode=barcode).first()
+        if not product:
+            return None
+
+        return self._cache_product(product)
+
+    def _cache_product(self, product):
+        """Serialize a local product once and cache it for the next scans"""
+        cached = {
+            'product_id': product.id,
+            'product': product.to_dict(),
+            # Check for banned ingredients
+            'warnings': self._check_banned_ingredients(product),
+        }
+        cache.set(f"product:{product.barcode}", cached, timeout=self.PRODUCT_CACHE_TIMEOUT)
+        return cached
+
+    def _cache_off_product(self, barcode, off_product):
+        """Remember an Open Food Facts answer; a confirmed miss is stored as {} for a shorter time"""
+        if off_product:
+            cache.set(f"off_product:{barcode}", off_product, timeout=self.OFF_CACHE_TIMEOUT)
+        else:
+            cache.set(f"off_product:{barcode}", {}, timeout=self.OFF_MISS_CACHE_TIMEOUT)
 
     def _check_banned_ingredients(self, product):
         """Check if product contains any banned/restricted ingredients in India"""
@@ -90,169 +257,188 @@ class ProductService:
             return warnings
 
         ingredients_lower = product.ingredients_list.lower()
+        categories_to_check, health_checks = self.INGREDIENT_CHECKS.get(
+            product.category, self.DEFAULT_INGREDIENT_CHECK
+        )
 
-        # Determine category for banned ingredient check
-        categories_to_check = ['food', 'cosmetic', 'drug']
-        if product.category in ['skincare', 'haircare']:
-            categories_to_check = ['cosmetic']
-        elif product.category == 'medicine':
-            categories_to_check = ['drug']
-        elif product.category in ['food', 'nutraceutical']:
-            categories_to_check = ['food']
-
-        banned = BannedIngredient.query.filter(
-            BannedIngredient.category.in_(categories_to_check)
-        ).all()
-
-        for item in banned:
-            if item.ingredient_name.lower() in ingredients_lower:
-                warnings.append({
-                    'type': 'banned_ingredient',
-                    'severity': 'critical' if item.ban_type == 'banned' else 'high',
-                    'message': f"⚠️ Contains {item.ingredient_name} which is {item.ban_type} by {item.regulatory_body}",
-                    'reason': item.reason,
-                    'regulation': item.regulation_reference,
-                })
+        # Every banned name is looked for in a single pass over the ingredients
+        entries, matcher = self._get_banned_ingredients(categories_to_check)
+        found = names_in(matcher, ingredients_lower)
+        for name_lower, warning in entries:
+            if name_lower in found:
+                warnings.append(dict(warning))
 
         # Additional health warnings
-        if product.category == 'food':
-            if product.sodium_mg and product.sodium_mg > 600:
-                warnings.append({
-                    'type': 'health_advisory',
-                    'severity': 'medium',
-                    'message': '⚠️ High sodium content. WHO recommends less than 2000mg sodium per day.',
-                })
-            if product.sugar_g and product.sugar_g > 12:
-                warnings.append({
-                    'type': 'health_advisory',
-                    'severity': 'medium',
-                    'message': '⚠️ High sugar content per serving.',
-                })
-            if product.trans_fat_g and product.trans_fat_g > 0:
-                warnings.append({
-                    'type': 'health_advisory',
-                    'severity': 'high',
-                    'message': '⚠️ Contains trans fat. FSSAI recommends zero trans fat intake.',
-                })
+        if health_checks:
+            for attr, limit, severity, message in self.HEALTH_RULES:
+                value = getattr(product, attr)
+                if value and value > limit:
+                    warnings.append({
+                        'type': 'health_advisory',
+                        'severity': severity,
+                        'message': message,
+                    })
 
         return warnings
 
-    def _save_off_product(self, barcode, off_data):
-        """Save Open Food Facts product to local database"""
-        try:
-            product = Product(
-                barcode=barcode,
-                name=off_data.get('product_name', 'Unknown Product'),
-                brand=off_data.get('brands', ''),
-                category='food',
-                description=off_data.get('generic_name', ''),
-                manufacturer=off_data.get('manufacturing_places', ''),
-                country_of_origin=off_data.get('countries', ''),
-                net_weight=off_data.get('quantity', ''),
-                ingredients_list=off_data.get('ingredients_text', ''),
-                allergens=off_data.get('allergens', ''),
-                image_url=off_data.get('image_url', ''),
-                data_source='openfoodfacts',
-                last_verified=datetime.utcnow(),
-            )
+    def _get_banned_ingredients(self, categories):
+        """
+        Banned ingredients for these categories as (lowercased name, warning)
+        pairs, with a matcher over all their names
+        """
+        if (self._banned_rows is None
+                or time.monotonic() - self._banned_loaded_at >= self.BANNED_CACHE_TIMEOUT):
+            self._load_banned_ingredients()
 
-            # Nutritional info
-            nutriments = off_data.get('nutriments', {})
-            if nutriments:
-                product.energy_kcal = nutriments.get('energy-kcal_100g')
-                product.protein_g = nutriments.get('proteins_100g')
-                product.carbohydrates_g = nutriments.get('carbohydrates_100g')
-                product.sugar_g = nutriments.get('sugars_100g')
-                product.fat_g = nutriments.get('fat_100g')
-                product.saturated_fat_g = nutriments.get('saturated-fat_100g')
-                product.fiber_g = nutriments.get('fiber_100g')
-                product.sodium_mg = nutriments.get('sodium_100g', 0) * 1000 if nutriments.get('sodium_100g') else None
-
-            db.session.add(product)
-            db.session.commit()
-            return product
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error saving OFF product: {e}")
-            return None
+        key = frozenset(categories)
+        cached = self._banned_by_categories.get(key)
+        if cached is None:
+            entries = [
+                (name_lower, warning)
+                for category, name_lower, warning in self._banned_rows
+                if category in key
+            ]
+            cached = (entries, compile_name_matcher(name for name, _ in entries))
+            self._banned_by_categories[key] = cached
+        return cached
 
-    def _save_fssai_product(self, barcode, fssai_data):
-        """Save FSSAI product to local database"""
-        try:
-            product = Product(
-                barcode=barcode,
-                name=fssai_data.get('product_name', 'Unknown'),
-                brand=fssai_data.get('brand', ''),
-                category='food',
-                fssai_license=fssai_data.get('fssai_license', ''),
-                fssai_category=fssai_data.get('category', ''),
-                manufacturer=fssai_data.get('manufacturer', ''),
-                manufacturer_address=fssai_data.get('address', ''),
-                data_source='fssai',
-                last_verified=datetime.utcnow(),
-            )
-            db.session.add(product)
-            db.session.commit()
-            return product
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error saving FSSAI product: {e}")
-            return None
+    def _load_banned_ingredients(self):
+        """Read the whole (small) banned-ingredient table in one query"""
+        self._banned_rows = [
+            (item.category, item.ingredient_name.lower(), {
+                'type': 'banned_ingredient',
+                'severity': 'critical' if item.ban_type == 'banned' else 'high',
+                'message': f"⚠️ Contains {item.ingredient_name} which is {item.ban_type} by {item.regulatory_body}",
+                'reason': item.reason,
+                'regulation': item.regulation_reference,
+            })
+            for item in BannedIngredient.query.order_by(BannedIngredient.id).all()
+        ]
+        self._banned_by_categories = {}
+        self._banned_loaded_at = time.monotonic()
+
+    def invalidate_banned_cache(self):
+        """Drop cached banned ingredients (call after changing the table)"""
+        self._banned_rows = None
+        self._banned_by_categories = {}
 
-    def _save_cdsco_product(self, barcode, cdsco_data):
-        """Save CDSCO medicine to local database"""
+    def _save_product(self, barcode, fields, source_name):
+        """
+        Store a product from an external source and return its cache entry
+        (product_id, serialized product, warnings), or None if saving failed.
+
+        Uses INSERT ... ON CONFLICT DO NOTHING where supported, so concurrent
+        scans of a new barcode don't fail on the unique constraint; the row
+        already stored wins either way. The stored row is serialized once and
+        cached, so the next scan of the barcode doesn't query or serialize it.
+        """
+        values = dict(fields, barcode=barcode, last_verified=datetime.utcnow())
         try:
-            product = Product(
-                barcode=barcode,
-                name=cdsco_data.get('product_name', 'Unknown'),
-                brand=cdsco_data.get('brand', ''),
-                category='medicine',
-                drug_license_number=cdsco_data.get('drug_license', ''),
-                composition=cdsco_data.get('composition', ''),
-                manufacturer=cdsco_data.get('manufacturer', ''),
-                prescription_required=cdsco_data.get('prescription_required', False),
-                schedule=cdsco_data.get('schedule', ''),
-                data_source='cdsco',
-                last_verified=datetime.utcnow(),
-            )
-            db.session.add(product)
-            db.session.commit()
-            return product
-        except Exception as e:
+            conflict_insert = _CONFLICT_INSERTS.get(db.engine.dialect.name)
+            if conflict_insert is not None:
+                db.session.execute(
+                    conflict_insert(Product).values(**values)
+                    .on_conflict_do_nothing(index_elements=['barcode'])
+                )
+                db.session.commit()
+            else:
+                try:
+                    db.session.add(Product(**values))
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+            product = Product.query.filter_by(barcode=barcode).first()
+            return self._cache_product(product) if product else None
+        except Exception:
             db.session.rollback()
-            print(f"Error saving CDSCO product: {e}")
+            logger.exception("Error saving %s product", source_name)
             return None
 
+    def _off_product_fields(self, off_data):
+        """Product columns from Open Food Facts product data"""
+        fields = {
+            'name': off_data.get('product_name', 'Unknown Product'),
+            'brand': off_data.get('brands', ''),
+            'category': 'food',
+            'description': off_data.get('generic_name', ''),
+            'manufacturer': off_data.get('manufacturing_places', ''),
+            'country_of_origin': off_data.get('countries', ''),
+            'net_weight': off_data.get('quantity', ''),
+            'ingredients_list': off_data.get('ingredients_text', ''),
+            'allergens': off_data.get('allergens', ''),
+            'image_url': off_data.get('image_url', ''),
+            'data_source': 'openfoodfacts',
+        }
+
+        # Nutritional info
+        nutriments = off_data.get('nutriments', {})
+        if nutriments:
+            fields.update({
+                'energy_kcal': nutriments.get('energy-kcal_100g'),
+                'protein_g': nutriments.get('proteins_100g'),
+                'carbohydrates_g': nutriments.get('carbohydrates_100g'),
+                'sugar_g': nutriments.get('sugars_100g'),
+                'fat_g': nutriments.get('fat_100g'),
+                'saturated_fat_g': nutriments.get('saturated-fat_100g'),
+                'fiber_g': nutriments.get('fiber_100g'),
+                'sodium_mg': nutriments.get('sodium_100g', 0) * 1000 if nutriments.get('sodium_100g') else None,
+            })
+        return fields
+
+    def _fssai_product_fields(self, fssai_data):
+        """Product columns from FSSAI product data"""
+        return {
+            'name': fssai_data.get('product_name', 'Unknown'),
+            'brand': fssai_data.get('brand', ''),
+            'category': 'food',
+            'fssai_license': fssai_data.get('fssai_license', ''),
+            'fssai_category': fssai_data.get('category', ''),
+            'manufacturer': fssai_data.get('manufacturer', ''),
+            'manufacturer_address': fssai_data.get('address', ''),
+            'data_source': 'fssai',
+        }
+
+    def _cdsco_product_fields(self, cdsco_data):
+        """Product columns from CDSCO medicine data"""
+        return {
+            'name': cdsco_data.get('product_name', 'Unknown'),
+            'brand': cdsco_data.get('brand', ''),
+            'category': 'medicine',
+            'drug_license_number': cdsco_data.get('drug_license', ''),
+            'composition': cdsco_data.get('composition', ''),
+            'manufacturer': cdsco_data.get('manufacturer', ''),
+            'prescription_required': cdsco_data.get('prescription_required', False),
+            'schedule': cdsco_data.get('schedule', ''),
+            'data_source': 'cdsco',
+        }
+
     def _log_scan(self, barcode, product_id, scan_method, found, source, request):
-        """Log scan to history"""
-        try:
-            scan = ScanHistory(
-                barcode_scanned=barcode,
-                product_id=product_id,
-                scan_method=scan_method,
-                product_found=found,
-                data_source=source,
-                ip_address=request.remote_addr if request else None,
-                user_agent=request.user_agent.string if request else None,
-            )
-            db.session.add(scan)
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error logging scan: {e}")
+        """Queue scan for the background history writer"""
+        self.scan_log.enqueue(current_app._get_current_object(), {
+            'barcode_scanned': barcode,
+            'product_id': product_id,
+            'scan_method': scan_method,
+            'product_found': found,
+            'data_source': source,
+            'ip_address': request.remote_addr if request else None,
+            'user_agent': request.user_agent.string if request else None,
+            'scanned_at': datetime.utcnow(),
+        })
 
     def _get_barcode_details(self, barcode):
         """Get basic barcode information"""
-        from scanners.barcode_reader import BarcodeReader
-        reader = BarcodeReader()
-        return reader.get_barcode_info(barcode)
+        return self.barcode_reader.get_barcode_info(barcode)
 
+    @cache.memoize(timeout=30)
     def get_scan_history(self, limit=50):
         """Get recent scan history"""
-        scans = ScanHistory.query.order_by(
+        # One joined query over plain column tuples; no ORM objects to build
+        rows = db.session.query(*ScanHistory.history_columns()).outerjoin(
+            Product, ScanHistory.product_id == Product.id
+        ).order_by(
             ScanHistory.scanned_at.desc()
         ).limit(limit).all()
-        return [scan.to_dict() for scan in scans]
+        return [ScanHistory.history_row_to_dict(row) for row in rows]
 
     def search_products(self, query, category=None):
         """Search products by name or brand"""
@@ -269,8 +455,11 @@ class ProductService:
         if category:
             filters.append(Product.category == category)
 
-        products = Product.query.filter(*filters).limit(20).all()
-        return [p.to_dict() for p in products]
+        products = Product.query.options(
+            load_only(*Product.list_columns()),
+            lazyload(Product.warnings),
+        ).filter(*filters).limit(20).all()
+        return [p.to_list_dict() for p in products]
 
     def get_fssai_info(self, license_number):
         """Get FSSAI license information"""
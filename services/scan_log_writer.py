@@ -0,0 +1,88 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from database.models import db, ScanHistory
+
+logger = logging.getLogger(__name__)
+
+
+class ScanLogWriter:
+    """
+    Write-behind queue for scan history rows.
+
+    Scan responses don't depend on the history row, so inserts are queued
+    and flushed in batches by a daemon thread instead of committing inside
+    the request.
+    """
+
+    FLUSH_INTERVAL = 0.5   # seconds between batch flushes
+    MAX_PENDING = 10000    # rows held before new scans are dropped
+
+    def __init__(self, on_flush=None):
+        self.on_flush = on_flush
+        self._queue = queue.Queue(maxsize=self.MAX_PENDING)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._app = None
+
+    def enqueue(self, app, row):
+        """Queue a ScanHistory row (as a column dict) for the next flush"""
+        self._ensure_started(app)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            logger.warning("Scan log queue full, dropping scan history row")
+
+    def _ensure_started(self, app):
+        # Started lazily so each gunicorn worker gets its own thread after fork
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._app = app
+            self._thread = threading.Thread(
+                target=self._run, name='scan-log-writer', daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Let the batch fill up for one interval before writing it
+            time.sleep(self.FLUSH_INTERVAL)
+            self._drain_into(batch)
+            self._write(batch)
+
+    def _drain_into(self, batch):
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return
+
+    def flush(self):
+        """Write any queued rows now (used at shutdown)"""
+        batch = []
+        self._drain_into(batch)
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        with self._app.app_context():
+            try:
+                db.session.bulk_insert_mappings(ScanHistory, batch)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Error logging %d scans", len(batch))
+                return
+            finally:
+                db.session.remove()
+
+            if self.on_flush:
+                self.on_flush()
@@ -0,0 +1,169 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+import requests
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import image_scanner
+from services.cdsco_service import CDSCOService
+from services.image_scanner import (
+    ImageBarcodeScanner, _FIRST_CODES, _G_CODES, _L_CODES, _R_CODES,
+)
+from services.name_matcher import compile_name_matcher, names_in
+from services.openfoodfacts import OpenFoodFactsService
+
+
+def ean13_modules(barcode):
+    """The 95 modules (bar = 1) of an EAN-13 symbol"""
+    digits = [int(c) for c in barcode]
+    parity = _FIRST_CODES[digits[0]]
+    bits = '101'
+    for i, digit in enumerate(digits[1:7]):
+        bits += (_G_CODES if parity[i] == '1' else _L_CODES)[digit]
+    bits += '01010'
+    for digit in digits[7:]:
+        bits += _R_CODES[digit]
+    bits += '101'
+    return np.array([int(b) for b in bits], dtype=np.uint8)
+
+
+def ean13_row(barcode, module_width, quiet=10):
+    """A scanline with the symbol at `module_width` pixels per module"""
+    modules = np.concatenate((
+        np.zeros(quiet, dtype=np.uint8), ean13_modules(barcode), np.zeros(quiet, dtype=np.uint8),
+    ))
+    return np.repeat(modules, module_width)
+
+
+class EAN13DecoderTest(unittest.TestCase):
+    BARCODES = ('8901058851854', '4006381333931', '0012345678905')
+
+    def setUp(self):
+        self.scanner = ImageBarcodeScanner()
+
+    def test_decodes_row_at_module_widths(self):
+        for barcode in self.BARCODES:
+            for width in (1, 2, 4):
+                with self.subTest(barcode=barcode, width=width):
+                    row = ean13_row(barcode, width)
+                    self.assertEqual(self.scanner._find_ean13(row), barcode)
+
+    def test_decodes_without_numba(self):
+        with mock.patch.object(image_scanner, '_scan_ean13_jit', None):
+            for width in (1, 2, 4):
+                with self.subTest(width=width):
+                    row = ean13_row('8901058851854', width)
+                    self.assertEqual(self.scanner._find_ean13(row), '8901058851854')
+
+    def test_decodes_image_at_module_widths(self):
+        for width in (1, 2, 4):
+            with self.subTest(width=width):
+                row = ean13_row('8901058851854', width)
+                # Bars are dark: 1 -> 0 (black), 0 -> 255 (white)
+                pixels = np.tile(np.where(row == 1, 0, 255).astype(np.uint8), (60, 1))
+                image = Image.fromarray(pixels, mode='L')
+                self.assertEqual(self.scanner._try_pure_python(image), '8901058851854')
+
+    def test_rejects_bad_check_digit(self):
+        # Same symbol with the last digit changed, so the checksum fails
+        self.assertIsNone(self.scanner._find_ean13(ean13_row('8901058851855', 2)))
+
+    def test_rejects_random_rows(self):
+        rng = np.random.default_rng(1234)
+        rows = rng.integers(0, 2, size=(200, 400), dtype=np.uint8)
+        self.assertEqual(self.scanner._find_ean13_rows(rows), [None] * len(rows))
+
+        # Random run lengths, closer to real scanlines than per-pixel noise
+        for _ in range(200):
+            widths = rng.integers(1, 5, size=120)
+            row = np.repeat(np.arange(len(widths), dtype=np.uint8) % 2, widths)
+            self.assertIsNone(self.scanner._find_ean13(row))
+
+    def test_rejects_blank_row(self):
+        self.assertIsNone(self.scanner._find_ean13(np.zeros(300, dtype=np.uint8)))
+
+
+class NameMatcherTest(unittest.TestCase):
+
+    def test_reports_contained_names(self):
+        matcher = compile_name_matcher(['ab', 'abc'])
+        self.assertEqual(names_in(matcher, 'xabc'), {'ab', 'abc'})
+
+    def test_reports_overlapping_and_repeated_names(self):
+        matcher = compile_name_matcher(['red 2g', '2g', 'lead'])
+        self.assertEqual(names_in(matcher, 'red 2g, lead, red 2g'), {'red 2g', '2g', 'lead'})
+        self.assertEqual(names_in(matcher, 'wheat flour'), set())
+
+    def test_no_names(self):
+        matcher = compile_name_matcher([])
+        self.assertIsNone(matcher)
+        self.assertEqual(names_in(matcher, 'anything'), set())
+
+    def test_special_characters_are_literal(self):
+        matcher = compile_name_matcher(['e.102', '(a)'])
+        self.assertEqual(names_in(matcher, 'e 102 and (a)'), {'(a)'})
+
+
+class CDSCOBannedDrugTest(unittest.TestCase):
+
+    def setUp(self):
+        self.service = CDSCOService()
+
+    def test_finds_banned_drug_in_composition(self):
+        warnings = self.service.check_banned_drug('Nimesulide 100mg + Paracetamol 325mg')
+        self.assertEqual([w['type'] for w in warnings], ['banned_drug'])
+        self.assertTrue(warnings[0]['drug'].startswith('Nimesulide'))
+
+    def test_clean_composition(self):
+        self.assertEqual(self.service.check_banned_drug('Paracetamol 500mg'), [])
+        self.assertEqual(self.service.check_banned_drug(''), [])
+
+    def test_interactions_across_compositions(self):
+        interactions = self.service.get_drug_interactions(['Paracetamol 500mg', 'Warfarin 5mg'])
+        self.assertEqual([i['drugs'] for i in interactions], ['paracetamol + warfarin'])
+        self.assertEqual(self.service.get_drug_interactions(['Paracetamol 500mg']), [])
+
+
+class OpenFoodFactsStatusTest(unittest.TestCase):
+    """Confirmed misses are told apart from failed lookups (only misses get cached)"""
+
+    def setUp(self):
+        self.service = OpenFoodFactsService()
+
+    def status_for(self, status_code=200, content=b'{}', error=None):
+        response = mock.Mock(status_code=status_code, content=content)
+        get = mock.Mock(side_effect=error, return_value=response)
+        with mock.patch.object(self.service, 'session', mock.Mock(get=get)):
+            return self.service.get_product_status('8901058851854')
+
+    def test_found(self):
+        product, answered = self.status_for(
+            content=b'{"status": 1, "product": {"product_name": "Parle-G"}}'
+        )
+        self.assertTrue(answered)
+        self.assertEqual(product['product_name'], 'Parle-G')
+
+    def test_confirmed_miss(self):
+        self.assertEqual(self.status_for(content=b'{"status": 0}'), (None, True))
+        self.assertEqual(self.status_for(status_code=404), (None, True))
+
+    def test_failures_are_not_answers(self):
+        self.assertEqual(self.status_for(status_code=429), (None, False))
+        self.assertEqual(self.status_for(status_code=503), (None, False))
+        self.assertEqual(self.status_for(content=b'<html>'), (None, False))
+        self.assertEqual(self.status_for(error=requests.Timeout('slow')), (None, False))
+
+    def test_missing_nutriments_are_not_shared(self):
+        first = self.service._format_product({})
+        first['nutriments']['energy'] = 1
+        self.assertEqual(self.service._format_product({})['nutriments'], {})
+        self.assertEqual(OpenFoodFactsService.PRODUCT_DEFAULTS['nutriments'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()